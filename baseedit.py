@@ -1,5 +1,6 @@
 import tkinter as tk
 from tkinter import ttk
+from collections import OrderedDict
 import os
 
 try:
@@ -14,6 +15,56 @@ from baseinfo import BASE_LAYOUTS, BASE_NAMES, BASE_NAMES_REV
 from decors import SIZES, DECORATIONS, NAMES, NAMES_REV
 
 
+IMAGE_CACHE_SIZE = 512  # enough for every interior and decoration at a few scales
+DRAG_TICK_MS = 16  # move the drag ghost at most ~60 times a second
+
+
+def interior_path(layout):
+    return os.path.join(os.getcwd(), 'interior', f'{layout}.png')
+
+
+def decoration_path(decor):
+    if "NOTE_MAT" in decor:
+        return os.path.join(os.getcwd(), 'decorations', 'NOTE_MAT.png')
+    return os.path.join(os.getcwd(), 'decorations', f'{decor.replace("DECOR_", "")}.png')
+
+
+class ImageCache:
+    # Decoded and zoomed PhotoImages keyed by (path, scale), least recently
+    # used first. Shared by every EditCanvas, so redraws only read and decode
+    # a PNG the first time it is shown at that scale. The images belong to
+    # the default Tk root.
+    def __init__(self, maxsize=IMAGE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.images = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, scale=1):
+        key = (path, scale)
+        img = self.images.get(key)
+        if img is not None:
+            self.images.move_to_end(key)
+            self.hits += 1
+            return img
+
+        self.misses += 1
+        img = tk.PhotoImage(file=path)
+        if scale != 1:
+            img = img.zoom(scale)
+        self.images[key] = img
+        # An evicted image stays alive while a canvas still holds it in imgs.
+        if len(self.images) > self.maxsize:
+            self.images.popitem(last=False)
+        return img
+
+    def clear(self):
+        self.images.clear()
+
+
+IMAGE_CACHE = ImageCache()
+
+
 def get_decoration_offset(decor_id):
     # returns x, y offset
     w, h = SIZES[decor_id]
@@ -39,47 +90,38 @@ def get_decoration_offset(decor_id):
     return -7, -7
 
 
-def sort_decorations(decors, positions, reverse=False):
-    sorted_decors = []
-    sorted_positions = []
+def is_floor_decoration(decor):
+    # Mats, desks, the tire and bricks are drawn under everything else.
+    return decor.endswith("MAT") or decor.endswith("DESK") or decor.endswith("BRICK") or decor == "DECOR_TIRE"
 
-    # mats get drawn first
-    for i in range(len(decors)):
-        if decors[i].endswith("MAT"):
-            sorted_decors.append(decors[i])
-            sorted_positions.append(positions[i])
 
-    # then desks
-    for i in range(len(decors)):
-        if decors[i].endswith("DESK") or decors[i] == "DECOR_TIRE":
-            sorted_decors.append(decors[i])
-            sorted_positions.append(positions[i])
+def sort_decoration_indices(decors, positions, reverse=False):
+    # The order decorations are drawn in, as indices into decors.
+    indices = range(len(decors))
 
+    # mats get drawn first
+    order = [i for i in indices if decors[i].endswith("MAT")]
+    # then desks
+    order += [i for i in indices if decors[i].endswith("DESK") or decors[i] == "DECOR_TIRE"]
     # then bricks
-    for i in range(len(decors)):
-        if decors[i].endswith("BRICK"):
-            sorted_decors.append(decors[i])
-            sorted_positions.append(positions[i])
-
+    order += [i for i in indices if decors[i].endswith("BRICK")]
     # then everything else, but lower y values get drawn first!!!!
-    sorted_decs = sorted(zip(decors, positions), key=lambda x: x[1][1], reverse=reverse)
-    for decor, pos in sorted_decs:
-        if (
-            not decor.endswith("MAT")
-            and not decor.endswith("DESK")
-            and not decor.endswith("BRICK")
-            and decor != "DECOR_TIRE"
-        ):
-            sorted_decors.append(decor)
-            sorted_positions.append(pos)
+    order += sorted(
+        (i for i in indices if not is_floor_decoration(decors[i])),
+        key=lambda i: positions[i][1],
+        reverse=reverse,
+    )
 
     if reverse:
-        sorted_decors = sorted_decors[::-1]
-        sorted_positions = sorted_positions[::-1]
+        order.reverse()
 
-    return sorted_decors, sorted_positions
+    return order
 
 
+def sort_decorations(decors, positions, reverse=False):
+    order = sort_decoration_indices(decors, positions, reverse)
+    return [decors[i] for i in order], [positions[i] for i in order]
+
 
 class EditCanvas(tk.Frame):
     def __init__(self, master, scale=1):
@@ -90,6 +132,33 @@ class EditCanvas(tk.Frame):
         self.mode = "normal"
         self.selected_decor_idx = None
 
+        # Canvas items are made once and then moved, restacked or hidden as
+        # the base changes, rather than redrawn. Each decoration slot keeps
+        # its own image item, and drawn holds what each item last showed so
+        # only the ones that changed are touched.
+        self.bg_item = None
+        self.decor_items = []
+        self.select_item = None
+        self.drawn = {}
+        self.stack = []
+        self.imgs = {}
+
+        # One action often asks for several draws (select() inside
+        # handle_drag, set_decor inside detect_right_click, ...). They are
+        # folded into a single draw when Tk is next idle.
+        self.draw_pending = None
+        self.draw_requests = 0
+        self.redraws_coalesced = 0
+
+        # While dragging, motion events only store the latest pointer
+        # position. A timer moves a ghost of the decoration to it, and the
+        # base is only changed when the button is released.
+        self._drag_start_grid = None
+        self._drag_start_decor_pos = None
+        self.drag_pointer = None
+        self.drag_tick = None
+        self.ghost_item = None
+
         self.add_controls()
 
         self.canvas = tk.Canvas(self, width=272 * self.scale, height=272 * self.scale)
@@ -98,6 +167,7 @@ class EditCanvas(tk.Frame):
         self.canvas.bind("<Button-1>", self.detect_click)
         self.canvas.bind("<Button-3>", self.detect_right_click)
         self.canvas.bind("<B1-Motion>", self.handle_drag)
+        self.canvas.bind("<ButtonRelease-1>", self.end_drag)
 
     def add_controls(self):
         self.controls = tk.Frame(self)
@@ -143,30 +213,21 @@ class EditCanvas(tk.Frame):
         if self.selected_decor_idx < 0 or self.selected_decor_idx >= len(self.base['decorations']):
             return
         self.base['decorations'][self.selected_decor_idx] = decor
-        self.draw()
+        self.request_draw()
 
     def set_x(self, x):
         if self.base is None:
             return
         self.base['decoration_positions'][self.selected_decor_idx] = (x, self.base['decoration_positions'][self.selected_decor_idx][1])
         self.xVar.set(x)
-        self.draw()
+        self.request_draw()
 
     def set_y(self, y):
         if self.base is None:
             return
         self.base['decoration_positions'][self.selected_decor_idx] = (self.base['decoration_positions'][self.selected_decor_idx][0], y)
         self.yVar.set(y)
-        self.draw()
-
-    def sort(self):
-        if self.base is None:
-            return
-
-        self.base['decorations'], self.base['decoration_positions'] = sort_decorations(
-            self.base['decorations'],
-            self.base['decoration_positions']
-        )
+        self.request_draw()
 
     def select(self, idx):
         if self.base is None:
@@ -181,28 +242,85 @@ class EditCanvas(tk.Frame):
         self.xVar.set(self.base['decoration_positions'][idx][0])
         self.yVar.set(self.base['decoration_positions'][idx][1])
 
-        self.draw()
+        self.request_draw()
 
     def load_and_draw(self, base):
         self.base = base
-        self.sort()
         self.select(0)
+        self.request_draw()
+
+    def request_draw(self):
+        self.draw_requests += 1
+        if self.draw_pending is not None:
+            self.redraws_coalesced += 1
+            return
+        self.draw_pending = self.after_idle(self.flush_draw)
+
+    def flush_draw(self):
+        self.draw_pending = None
         self.draw()
 
+    def destroy(self):
+        if self.draw_pending is not None:
+            self.after_cancel(self.draw_pending)
+            self.draw_pending = None
+        if self.drag_tick is not None:
+            self.after_cancel(self.drag_tick)
+            self.drag_tick = None
+        super().destroy()
+
     def draw(self):
-        self.imgs = []
-        self.canvas.delete("all")
+        if self.bg_item is None:
+            self.bg_item = self.canvas.create_image(0, 0, anchor='nw', state='hidden')
+            self.select_item = self.canvas.create_rectangle(0, 0, 0, 0, outline="red", width=2, state='hidden')
+            self.ghost_item = self.canvas.create_image(0, 0, anchor='nw', state='hidden')
         self.draw_background()
         self.draw_decorations()
         self.draw_controls()
 
+    def update_item(self, item, state):
+        # Brings item in line with state, which is None for a hidden item or
+        # (image, *coords) otherwise, with no image for the selection
+        # rectangle. Returns True if anything changed.
+        old = self.drawn.get(item)
+        if state == old:
+            return False
+        self.drawn[item] = state
+        if state is None:
+            self.canvas.itemconfigure(item, state='hidden')
+            return True
+        if old is None or old[0] != state[0]:
+            if state[0] is None:
+                self.canvas.itemconfigure(item, state='normal')
+            else:
+                self.canvas.itemconfigure(item, image=state[0], state='normal')
+        if old is None or old[1:] != state[1:]:
+            self.canvas.coords(item, *state[1:])
+        return True
+
+    def decoration_origin(self, decor, position):
+        # Canvas coordinates of the top left of decor at position.
+        x_offset, y_offset = get_decoration_offset(decor)
+
+        if SIZES[decor] == (2, 2) and decor.endswith("DOLL"):
+            extra_x = -16
+        else:
+            extra_x = 0
+
+        x = (position[0] + x_offset) * 16 * self.scale + extra_x
+        y = (position[1] + y_offset) * 16 * self.scale
+        return x, y
+
     def get_decor_under_point(self, x, y):
         if self.base is None:
             return None
         tile_size = 16 * self.scale
         dolls_cushions = []
         others = []
-        for i in range(len(self.base['decorations'])-1, -1, -1):
+        # topmost first, in the order they are drawn; the base itself keeps
+        # the order it was saved in
+        order = sort_decoration_indices(self.base['decorations'], self.base['decoration_positions'])
+        for i in reversed(order):
             decor = self.base['decorations'][i]
             if decor == "DECOR_NONE":
                 continue
@@ -237,6 +355,7 @@ class EditCanvas(tk.Frame):
             return
         x, y = event.x, event.y
         result = self.get_decor_under_point(x, y)
+        self._drag_start_grid = None
         if result is None:
             return
         i, decor, i_x_pos, i_y_pos = result
@@ -247,7 +366,7 @@ class EditCanvas(tk.Frame):
         self._drag_start_decor_pos = (i_x_pos, i_y_pos)
         print(f"Selected {decor} at {i_x_pos}, {i_y_pos}, drag started at grid {self._drag_start_grid}")
         self.select(i)
-        self.draw()
+        self.request_draw()
         return
 
     def detect_right_click(self, event):
@@ -261,108 +380,136 @@ class EditCanvas(tk.Frame):
         print(f"Right clicked {decor} at {i_x_pos}, {i_y_pos}")
         self.select(i)
         self.set_decor("DECOR_NONE")
-        self.draw()
+        self.request_draw()
         return
 
-    def handle_drag(self, event):
+    def drag_target(self):
+        # The position the dragged decoration would have with the pointer at
+        # drag_pointer, or None if no drag is in progress.
         if self.base is None or self.selected_decor_idx is None:
-            return
+            return None
         if self.selected_decor_idx < 0 or self.selected_decor_idx >= len(self.base['decorations']):
-            return
+            return None
 
-        x, y = event.x, event.y
+        # Get the grid cell where drag started and the original decor position
+        start_grid = self._drag_start_grid
+        start_decor_pos = self._drag_start_decor_pos
+        if start_grid is None or start_decor_pos is None or self.drag_pointer is None:
+            return None
+
+        x, y = self.drag_pointer
         tile_size = 16 * self.scale
         # Get the grid cell under the mouse pointer
         grid_x = x // tile_size
         grid_y = y // tile_size
 
-        # Get the grid cell where drag started and the original decor position
-        start_grid = getattr(self, '_drag_start_grid', None)
-        start_decor_pos = getattr(self, '_drag_start_decor_pos', None)
-        if start_grid is None or start_decor_pos is None:
-            return
-
         # Only move if the grid cell under the mouse is different from the drag start cell
         dx = grid_x - start_grid[0]
         dy = grid_y - start_grid[1]
-        new_x = start_decor_pos[0] + dx
-        new_y = start_decor_pos[1] + dy
+        return (int(start_decor_pos[0] + dx), int(start_decor_pos[1] + dy))
 
-        old_pos = self.base['decoration_positions'][self.selected_decor_idx]
-        new_pos = (int(new_x), int(new_y))
-        if old_pos == new_pos:
+    def handle_drag(self, event):
+        if self._drag_start_grid is None:
             return
-        self.base['decoration_positions'][self.selected_decor_idx] = new_pos
-        self.select(self.selected_decor_idx)
-        self.draw()
-
-    def draw_background(self):
-        if self.base is None:
+        self.drag_pointer = (event.x, event.y)
+        if self.drag_tick is None:
+            self.drag_tick = self.after(DRAG_TICK_MS, self.drag_step)
+
+    def drag_step(self):
+        # Moves the ghost and selection box to the latest pointer position.
+        self.drag_tick = None
+        pos = self.drag_target()
+        if pos is None or self.ghost_item is None:
             return
-        layout = BASE_LAYOUTS[BASE_NAMES_REV[self.base['secret_base_id']]]
-        if layout == "None":
+        decor = self.base['decorations'][self.selected_decor_idx]
+        if decor == "DECOR_NONE":
             return
-        fn = os.path.join(os.getcwd(), 'interior', f'{layout}.png')
-        self.bg = tk.PhotoImage(file=fn)
-        if self.scale != 1:
-            self.bg = self.bg.zoom(self.scale)
-        self.imgs.append(self.bg)
-        self.canvas.create_image(0, 0, image=self.bg, anchor='nw')
-
-    def draw_decorations(self):
-        if self.base is None:
+        img = IMAGE_CACHE.get(decoration_path(decor), self.scale)
+        self.imgs[self.ghost_item] = img
+        x, y = self.decoration_origin(decor, pos)
+        if self.update_item(self.ghost_item, (img, x, y)):
+            width, height = SIZES[decor]
+            self.update_item(self.select_item, (None, x, y, x + (16 * width) * self.scale, y + (16 * height) * self.scale))
+            self.xVar.set(pos[0])
+            self.yVar.set(pos[1])
+
+    def end_drag(self, event):
+        # Writes where the decoration was dropped back to the base.
+        if self.drag_tick is not None:
+            self.after_cancel(self.drag_tick)
+            self.drag_tick = None
+        if self._drag_start_grid is None:
             return
-        decors, positions = sort_decorations(
-            self.base['decorations'],
-            self.base['decoration_positions']
-        )
-        for i in range(len(decors)):
-            decor = decors[i]
-            if decor == "DECOR_NONE":
-                continue
-            if "NOTE_MAT" in decor:
-                fn = os.path.join(os.getcwd(), 'decorations', 'NOTE_MAT.png')
-            else:
-                fn = os.path.join(os.getcwd(), 'decorations', f'{decor.replace("DECOR_", "")}.png')
-            img = tk.PhotoImage(file=fn)
-            if self.scale != 1:
-                img = img.zoom(self.scale)
-            self.imgs.append(img)
-            x_offset, y_offset = get_decoration_offset(decor)
-
-            if SIZES[decor] == (2, 2) and decor.endswith("DOLL"):
-                extra_x = -16
-            else:
-                extra_x = 0
+        if event is not None:
+            self.drag_pointer = (event.x, event.y)
+        new_pos = self.drag_target()
+
+        self._drag_start_grid = None
+        self._drag_start_decor_pos = None
+        self.drag_pointer = None
+        if self.ghost_item is not None:
+            self.update_item(self.ghost_item, None)
+
+        if new_pos is not None and new_pos != self.base['decoration_positions'][self.selected_decor_idx]:
+            self.base['decoration_positions'][self.selected_decor_idx] = new_pos
+        # Also puts the selection box back if the drag ended where it began.
+        self.select(self.selected_decor_idx)
 
-            x = (positions[i][0] + x_offset) * 16 * self.scale + extra_x
-            y = (positions[i][1] + y_offset) * 16 * self.scale
+    def draw_background(self):
+        state = None
+        if self.base is not None:
+            layout = BASE_LAYOUTS[BASE_NAMES_REV[self.base['secret_base_id']]]
+            if layout != "None":
+                self.bg = IMAGE_CACHE.get(interior_path(layout), self.scale)
+                self.imgs[self.bg_item] = self.bg
+                state = (self.bg, 0, 0)
+        self.update_item(self.bg_item, state)
 
-            self.canvas.create_image(x, y, image=img, anchor='nw')
+    def draw_decorations(self):
+        decors = self.base['decorations'] if self.base is not None else []
+        positions = self.base['decoration_positions'] if self.base is not None else []
+
+        while len(self.decor_items) < len(decors):
+            self.decor_items.append(self.canvas.create_image(0, 0, anchor='nw', state='hidden'))
+
+        for i, item in enumerate(self.decor_items):
+            state = None
+            if i < len(decors) and decors[i] != "DECOR_NONE":
+                img = IMAGE_CACHE.get(decoration_path(decors[i]), self.scale)
+                self.imgs[item] = img
+                state = (img, *self.decoration_origin(decors[i], positions[i]))
+            self.update_item(item, state)
+
+        # Restack only from the first item that is out of order. Hiding an
+        # item leaves the rest in order, so nothing is raised.
+        stack = [
+            self.decor_items[i]
+            for i in sort_decoration_indices(decors, positions)
+            if decors[i] != "DECOR_NONE"
+        ]
+        if stack != self.stack:
+            shown = set(stack)
+            kept = [item for item in self.stack if item in shown]
+            start = 0
+            while start < len(kept) and stack[start] == kept[start]:
+                start += 1
+            if start < len(stack):
+                for item in stack[start:]:
+                    self.canvas.tag_raise(item)
+                self.canvas.tag_raise(self.select_item)
+                self.canvas.tag_raise(self.ghost_item)
+            self.stack = stack
 
     def draw_controls(self):
-        if self.base is None:
-            return
         # draw selected square
-        if self.selected_decor_idx is not None:
-            decor = self.base['decorations'][self.selected_decor_idx]
-            x_offset, y_offset = get_decoration_offset(decor)
+        state = None
+        idx = self.selected_decor_idx
+        if self.base is not None and idx is not None and idx < len(self.base['decorations']):
+            decor = self.base['decorations'][idx]
             width, height = SIZES[decor]
-            x_pos, y_pos = self.base['decoration_positions'][self.selected_decor_idx]
-
-            if SIZES[decor] == (2, 2) and decor.endswith("DOLL"):
-                extra_x = -16
-            else:
-                extra_x = 0
-
-            x_pos = (x_pos + x_offset) * 16 * self.scale + extra_x
-            y_pos = (y_pos + y_offset) * 16 * self.scale
-            self.canvas.create_rectangle(
-                x_pos, y_pos,
-                x_pos + (16 * width) * self.scale, y_pos + (16 * height) * self.scale,
-                outline="red",
-                width=2
-            )
+            x_pos, y_pos = self.decoration_origin(decor, self.base['decoration_positions'][idx])
+            state = (None, x_pos, y_pos, x_pos + (16 * width) * self.scale, y_pos + (16 * height) * self.scale)
+        self.update_item(self.select_item, state)
 
 
 def draw_base(base, output_filename):
@@ -374,8 +521,7 @@ def draw_base(base, output_filename):
     if layout == "None":
         return
     
-    fn = os.path.join(os.getcwd(), 'interior', f'{layout}.png')
-    bg = PIL.Image.open(fn)
+    bg = PIL.Image.open(interior_path(layout))
 
     decors, positions = sort_decorations(
         base['decorations'],
@@ -386,11 +532,7 @@ def draw_base(base, output_filename):
         decor = decors[i]
         if decor == "DECOR_NONE":
             continue
-        if "NOTE_MAT" in decor:
-            fn = os.path.join(os.getcwd(), 'decorations', 'NOTE_MAT.png')
-        else:
-            fn = os.path.join(os.getcwd(), 'decorations', f'{decor.replace("DECOR_", "")}.png')
-        img = PIL.Image.open(fn).convert("RGBA")
+        img = PIL.Image.open(decoration_path(decor)).convert("RGBA")
         x_offset, y_offset = get_decoration_offset(decor)
         x = (positions[i][0] + x_offset) * 16
         y = (positions[i][1] + y_offset) * 16
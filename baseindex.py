@@ -0,0 +1,263 @@
+"""SQLite index of the secret bases in a collection of saves.
+
+Usage:
+    python baseindex.py ingest bases.db PATH [PATH ...]
+    python baseindex.py query bases.db [--layout HASH] [--team HASH]
+                                       [--species NAME] [--decoration NAME]
+
+Ingesting parses saves in parallel and stores one row per non-empty base,
+with its layout_hash and team_hash, plus one row per decoration and party
+member. Saves are keyed by absolute path. Unchanged saves (same size and
+mtime) are skipped on re-ingest, and saves under the given paths that were
+deleted or no longer parse are dropped from the index. Queries on hashes, species and decorations use indexes instead of
+rescanning the saves.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from extract import find_saves, load_bases
+from viewbase import layout_hash, team_hash
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS saves (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    version TEXT
+);
+
+CREATE TABLE IF NOT EXISTS bases (
+    id INTEGER PRIMARY KEY,
+    save_id INTEGER NOT NULL REFERENCES saves(id) ON DELETE CASCADE,
+    slot INTEGER NOT NULL,
+    trainer_name TEXT NOT NULL,
+    trainer_id INTEGER NOT NULL,
+    sid INTEGER NOT NULL,
+    secret_base_id TEXT NOT NULL,
+    layout_hash TEXT NOT NULL,
+    team_hash TEXT NOT NULL,
+    decorations TEXT NOT NULL,  -- JSON, [[name, [x, y]], ...]
+    party TEXT NOT NULL,        -- JSON, as in the editor's export
+    UNIQUE (save_id, slot)
+);
+
+CREATE TABLE IF NOT EXISTS base_decorations (
+    base_id INTEGER NOT NULL REFERENCES bases(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    decoration TEXT NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS base_party (
+    base_id INTEGER NOT NULL REFERENCES bases(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    species TEXT NOT NULL,
+    held_item TEXT NOT NULL,
+    level INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS bases_layout_hash ON bases (layout_hash);
+CREATE INDEX IF NOT EXISTS bases_team_hash ON bases (team_hash);
+CREATE INDEX IF NOT EXISTS bases_trainer ON bases (trainer_id, sid);
+CREATE INDEX IF NOT EXISTS base_decorations_decoration ON base_decorations (decoration);
+CREATE INDEX IF NOT EXISTS base_decorations_base ON base_decorations (base_id);
+CREATE INDEX IF NOT EXISTS base_party_species ON base_party (species);
+CREATE INDEX IF NOT EXISTS base_party_base ON base_party (base_id);
+"""
+
+COMMIT_EVERY = 500  # files
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def index_file(path):
+    # Runs in a worker process and does all the decoding and hashing, so the
+    # main process only has to insert rows.
+    problems = []
+    try:
+        stat = os.stat(path)
+        _, version, bases = load_bases(path, problems)
+        rows = []
+        for slot, base in enumerate(bases):
+            if base is None or not base['trainer_name']:
+                continue
+            record = base.to_dict()
+            decorations = list(zip(record['decorations'], record['decoration_positions']))
+            rows.append((
+                slot,
+                record['trainer_name'],
+                int(record['id']),
+                int(record['sid']),
+                record['secret_base_id'],
+                layout_hash(base),
+                team_hash(base),
+                json.dumps(decorations, ensure_ascii=False),
+                json.dumps(record['party'], ensure_ascii=False),
+                [
+                    (i, decor, x, y)
+                    for i, (decor, (x, y)) in enumerate(decorations)
+                    if decor != "DECOR_NONE"
+                ],
+                [
+                    (i, mon['species'], mon['held_item'], mon['level'])
+                    for i, mon in enumerate(record['party'])
+                    if mon['species'] != 'None'
+                ],
+            ))
+    except Exception as e:
+        return path, None, None, None, [], problems, f"{type(e).__name__}: {e}"
+    return path, stat.st_size, stat.st_mtime, version, rows, problems, None
+
+
+def store_file(conn, path, size, mtime, version, rows):
+    conn.execute("DELETE FROM saves WHERE path = ?", (path,))
+    save_id = conn.execute(
+        "INSERT INTO saves (path, size, mtime, version) VALUES (?, ?, ?, ?)",
+        (path, size, mtime, version),
+    ).lastrowid
+    for *base_row, decorations, party in rows:
+        base_id = conn.execute(
+            "INSERT INTO bases (save_id, slot, trainer_name, trainer_id, sid, secret_base_id,"
+            " layout_hash, team_hash, decorations, party) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (save_id, *base_row),
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO base_decorations (base_id, position, decoration, x, y) VALUES (?, ?, ?, ?, ?)",
+            [(base_id, *row) for row in decorations],
+        )
+        conn.executemany(
+            "INSERT INTO base_party (base_id, position, species, held_item, level) VALUES (?, ?, ?, ?, ?)",
+            [(base_id, *row) for row in party],
+        )
+
+
+def under(path, roots):
+    return any(path == root or path.startswith(os.path.join(root, "")) for root in roots)
+
+
+def ingest(conn, paths, jobs=None, force=False):
+    # Indexes every save under paths. Saves are keyed by absolute path, so
+    # the same file is one entry however it was named. Entries under paths
+    # whose files are gone, or no longer parse, are removed. Returns
+    # (indexed, skipped, removed, errors).
+    known = {
+        path: (size, mtime)
+        for path, size, mtime in conn.execute("SELECT path, size, mtime FROM saves")
+    }
+
+    todo = []
+    skipped = 0
+    found = set()
+    for path in find_saves(paths):
+        path = os.path.abspath(path)
+        found.add(path)
+        stat = os.stat(path)
+        if not force and known.get(path) == (stat.st_size, stat.st_mtime):
+            skipped += 1
+        else:
+            todo.append(path)
+
+    roots = [os.path.abspath(path) for path in paths]
+    gone = [path for path in known if path not in found and under(path, roots)]
+    for path in gone:
+        conn.execute("DELETE FROM saves WHERE path = ?", (path,))
+    removed = len(gone)
+
+    indexed = errors = 0
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for path, size, mtime, version, rows, problems, error in executor.map(index_file, todo, chunksize=16):
+            for problem in problems:
+                print(f"{path}: {problem['message']}", file=sys.stderr)
+            if error is not None:
+                errors += 1
+                print(f"{path}: {error}", file=sys.stderr)
+                if conn.execute("DELETE FROM saves WHERE path = ?", (path,)).rowcount:
+                    removed += 1
+                continue
+            store_file(conn, path, size, mtime, version, rows)
+            indexed += 1
+            if indexed % COMMIT_EVERY == 0:
+                conn.commit()
+    conn.commit()
+    return indexed, skipped, removed, errors
+
+
+def query(conn, layout=None, team=None, species=None, decoration=None):
+    # Yields (path, slot, trainer_name, trainer_id, sid, layout_hash,
+    # team_hash) for bases matching every filter given.
+    sql = (
+        "SELECT saves.path, bases.slot, bases.trainer_name, bases.trainer_id, bases.sid,"
+        " bases.layout_hash, bases.team_hash FROM bases JOIN saves ON saves.id = bases.save_id"
+    )
+    where, params = [], []
+    if layout is not None:
+        where.append("bases.layout_hash = ?")
+        params.append(layout)
+    if team is not None:
+        where.append("bases.team_hash = ?")
+        params.append(team)
+    if species is not None:
+        where.append("bases.id IN (SELECT base_id FROM base_party WHERE species = ?)")
+        params.append(species)
+    if decoration is not None:
+        where.append("bases.id IN (SELECT base_id FROM base_decorations WHERE decoration = ?)")
+        params.append(decoration)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY saves.path, bases.slot"
+    yield from conn.execute(sql, params)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="add saves to the index")
+    ingest_parser.add_argument("db")
+    ingest_parser.add_argument("paths", nargs="+", help=".sav files or directories to search")
+    ingest_parser.add_argument("-j", "--jobs", type=int, help="worker processes (default: all cores)")
+    ingest_parser.add_argument("--force", action="store_true", help="re-index saves that haven't changed")
+
+    query_parser = subparsers.add_parser("query", help="find bases in the index")
+    query_parser.add_argument("db")
+    query_parser.add_argument("--layout", help="layout_hash")
+    query_parser.add_argument("--team", help="team_hash")
+    query_parser.add_argument("--species", help="e.g. Mudkip")
+    query_parser.add_argument("--decoration", help="e.g. DECOR_MUDKIP_DOLL")
+
+    args = parser.parse_args(argv)
+    conn = connect(args.db)
+
+    if args.command == "ingest":
+        indexed, skipped, removed, errors = ingest(conn, args.paths, args.jobs, args.force)
+        print(f"indexed {indexed} saves, skipped {skipped} unchanged, removed {removed} ({errors} failed)", file=sys.stderr)
+        return 1 if errors else 0
+
+    for path, slot, name, trainer_id, sid, lh, th in query(conn, args.layout, args.team, args.species, args.decoration):
+        print(json.dumps({
+            "source": path,
+            "slot": slot,
+            "trainer_name": name,
+            "id": str(trainer_id).zfill(5),
+            "sid": str(sid).zfill(5),
+            "layout_hash": lh,
+            "team_hash": th,
+        }, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
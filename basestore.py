@@ -0,0 +1,94 @@
+"""Content-addressed store for exported secret bases.
+
+A store is a folder laid out like this:
+
+    objects/ab/cdef0123....json   one file per distinct base
+    manifest.json                 {"Trainer (12345)": {"3": "abcdef0123..."}}
+
+Each object is the base's canonical JSON (sorted keys, no whitespace) and is
+named by the sha256 of those bytes. A base that is already in the store is
+never written again, so exporting the same saves over and over only costs
+the hashing. The manifest maps each trainer and slot to the object that was
+last exported for it.
+"""
+import hashlib
+import json
+import os
+
+
+MANIFEST_NAME = "manifest.json"
+OBJECTS_DIR = "objects"
+
+
+def canonical_json(record):
+    # The bytes that get hashed and stored. Two bases with the same fields
+    # always give the same bytes, whatever order the dict was built in.
+    return json.dumps(record, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def object_key(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def trainer_label(record):
+    # Same naming as the editor's one-file-per-base export.
+    return f"{record['trainer_name']} ({record['id']})"
+
+
+def write_atomic(path, data):
+    # Readers never see a half-written object or manifest.
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class BaseStore:
+    def __init__(self, root):
+        self.root = root
+        self.manifest = {}
+        self._dirty = False
+
+        os.makedirs(os.path.join(root, OBJECTS_DIR), exist_ok=True)
+        try:
+            with open(os.path.join(root, MANIFEST_NAME), "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            pass
+
+    def object_path(self, key):
+        return os.path.join(self.root, OBJECTS_DIR, key[:2], key[2:] + ".json")
+
+    def put(self, record):
+        # Stores a base dict (as from SecretBase.to_dict) and returns
+        # (key, written). written is False if the object was already there.
+        data = canonical_json(record)
+        key = object_key(data)
+        path = self.object_path(key)
+        if os.path.exists(path):
+            return key, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_atomic(path, data)
+        return key, True
+
+    def get(self, key):
+        with open(self.object_path(key), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def add(self, name, slot, record):
+        # Stores record and points the manifest entry for (name, slot) at it.
+        # Returns (key, written) as put does.
+        key, written = self.put(record)
+        entries = self.manifest.setdefault(name, {})
+        if entries.get(str(slot)) != key:
+            entries[str(slot)] = key
+            self._dirty = True
+        return key, written
+
+    def save_manifest(self):
+        # Only touches manifest.json if an entry changed.
+        if not self._dirty:
+            return
+        data = json.dumps(self.manifest, indent=4, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        write_atomic(os.path.join(self.root, MANIFEST_NAME), data)
+        self._dirty = False
@@ -0,0 +1,458 @@
+"""Microbenchmarks for the save file code paths.
+
+Usage: python bench.py [name ...] [--save path/to/file.sav]
+
+Without --save, a synthetic save with random section data is used.
+"""
+import argparse
+import os
+import random
+import struct
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+import viewbase
+from baseinfo import BASE_LAYOUTS, BASE_NAMES, BASE_NAMES_REV
+from decors import DECORATIONS
+from items import ITEMS
+from pokemon import MOVES, POKEMON
+
+
+def make_base(rng):
+    return {
+        "secret_base_id": rng.choice(list(BASE_NAMES.values())),
+        "to_register": rng.randrange(16),
+        "gender": rng.randrange(2),
+        "battled_owner_today": rng.randrange(2),
+        "registry_status": rng.randrange(4),
+        "trainer_name": "".join(rng.choice("ABCDEFGHabcdefgh") for _ in range(rng.randint(1, 7))),
+        "id": str(rng.randrange(65536)).zfill(5),
+        "sid": str(rng.randrange(65536)).zfill(5),
+        "language": viewbase.Language.ENGLISH,
+        "num_secret_bases_received": rng.randrange(65536),
+        "num_times_entered": rng.randrange(256),
+        "unused": 0,
+        "decorations": [rng.choice(DECORATIONS) for _ in range(16)],
+        "decoration_positions": [(rng.randint(7, 22), rng.randint(7, 22)) for _ in range(16)],
+        "party": [
+            {
+                "personality": f"{rng.getrandbits(32):08X}",
+                "moves": [rng.choice(MOVES) for _ in range(4)],
+                "species": rng.choice(POKEMON),
+                "held_item": rng.choice([x for x in ITEMS if x != '????????']),
+                "level": rng.randint(1, 100),
+                "evs": rng.randrange(256),
+            }
+            for _ in range(6)
+        ],
+    }
+
+
+def make_synthetic_save(seed=0):
+    # 28 sections of random data with the right ids, indices and checksums,
+    # followed by the extra sections, and 20 random bases in the active half.
+    # Good enough for timing, not for playing.
+    rng = random.Random(seed)
+    halves = []
+    for save_index in (1, 2):
+        sections = []
+        for i in range(viewbase.SECTION_COUNT):
+            section_id = (i - save_index) % viewbase.SECTION_COUNT
+            data = bytearray(rng.randbytes(viewbase.SECTION_SIZE))
+            if section_id == 0:
+                data[172] = 0
+                data[0x890:0xF2C] = bytes(0xF2C - 0x890)
+            section = viewbase.Section(data, section_id, 0, viewbase.SECTION_SIGNATURE, save_index)
+            section.fix_checksum()
+            sections.append(section)
+        halves.append(viewbase.HalfSave(sections))
+
+    fullsave = viewbase.FullSave(*halves, rng.randbytes(viewbase.EXTRA_SECTIONS_SIZE))
+    bases = [make_base(rng) for _ in range(20)]
+    viewbase.write_bases_to_save(fullsave.get_active(), enumerate(bases), 'ruby/sapphire')
+    return bytes(fullsave)
+
+
+def checksum_block_reference(f, idx):
+    # The original word-at-a-time implementation, kept here for comparison.
+    checksum = 0
+    read = 0
+    while True:
+        data = f.read(4)
+        if not data or read >= viewbase.cs_byte[idx]:
+            break
+        checksum += struct.unpack("<I", data)[0]
+        checksum = (checksum & 0xFFFFFFFF)
+        read += 4
+    result = (checksum & 0xFFFF) + (checksum >> 16)
+    return result & 0xFFFF
+
+
+def report(name, seconds, number, unit="call"):
+    per = seconds / number
+    print(f"  {name:<28} {per * 1e6:10.1f} us/{unit}  ({1 / per:,.0f} {unit}s/s)")
+
+
+def bench_checksum(buf, number=200):
+    from io import BytesIO
+
+    save = viewbase.parse_full_save(buf).get_active()
+    sections = save.sections
+
+    for section in sections:
+        expected = checksum_block_reference(BytesIO(section.data), section.section_id)
+        assert viewbase.checksum_section(section.data, section.section_id) == expected
+
+    def reference():
+        for section in sections:
+            checksum_block_reference(BytesIO(section.data), section.section_id)
+
+    def bulk():
+        for section in sections:
+            viewbase.checksum_section(section.data, section.section_id)
+
+    print(f"checksum (14 sections, numpy={viewbase.NUMPY_AVAILABLE})")
+    report("checksum_block (reference)", timeit.timeit(reference, number=number // 10), number // 10, "save")
+    report("checksum_section", timeit.timeit(bulk, number=number), number, "save")
+
+
+def bench_records(buf, number=200):
+    save = viewbase.parse_full_save(buf).get_active()
+    version = viewbase.getVersion(save)
+    bases = viewbase.get_all_bases_from_save(save, version)
+
+    # Every whole record, as (buffer, offset) pairs into the loaded sections.
+    records = [
+        (save.section_by_id(2 if index < 7 else 3), viewbase.record_offset(index, version))
+        for index in range(20) if index != 7
+    ]
+    target = bytearray(viewbase.SECRET_BASE_SIZE)
+    layout = viewbase.get_layout(version)
+    sections = {section_id: save.section_by_id(section_id) for section_id in (2, 3)}
+
+    def decode():
+        for section, offset in records:
+            viewbase.decode_secret_base(section.data, offset)
+
+    def decode_all():
+        # All 20, including the split one, from the joined region.
+        viewbase.decode_secret_bases(viewbase.read_record(sections, layout.region))
+
+    def encode():
+        for base in bases:
+            viewbase.encode_secret_base(base, target)
+
+    print("records (160 byte secret base codec)")
+    report("decode_secret_base", timeit.timeit(decode, number=number), number * len(records), "record")
+    report("decode_secret_bases (bulk)", timeit.timeit(decode_all, number=number), number * viewbase.SECRET_BASE_COUNT, "record")
+    report("encode_secret_base", timeit.timeit(encode, number=number), number * len(bases), "record")
+
+
+def bench_listing(buf, number=500):
+    save = viewbase.parse_full_save(buf).get_active()
+    version = viewbase.getVersion(save)
+
+    def listing(lazy):
+        # What App.update_list reads from each base.
+        for base in viewbase.get_all_bases_from_save(save, version, lazy=lazy):
+            base['trainer_name'], base['id']
+
+    print("listing (get_all_bases_from_save + name and ID of all 20)")
+    report("eager", timeit.timeit(lambda: listing(False), number=number), number, "save")
+    report("lazy", timeit.timeit(lambda: listing(True), number=number), number, "save")
+
+
+def bench_hashes(buf, number=500):
+    save = viewbase.parse_full_save(buf).get_active()
+    version = viewbase.getVersion(save)
+    bases = viewbase.get_all_bases_from_save(save, version)
+
+    def uncached():
+        for base in bases:
+            viewbase.compute_layout_hash(base)
+            viewbase.compute_team_hash(base)
+
+    def cached():
+        for base in bases:
+            viewbase.layout_hash(base)
+            viewbase.team_hash(base)
+
+    print("hashes (layout_hash + team_hash of all 20)")
+    report("recomputed", timeit.timeit(uncached, number=number), number, "save")
+    report("cached", timeit.timeit(cached, number=number), number, "save")
+
+
+def decode_text_reference(text):
+    # The original per-character join.
+    return "".join(viewbase.ENCODING_TABLE[c] for c in text)
+
+
+def encode_text_reference(text):
+    # The original linear table.index scan per character.
+    return bytes(viewbase.ENCODING_TABLE.index(c) for c in text)
+
+
+def bench_text(buf, number=20000):
+    rng = random.Random(1)
+    names = [make_base(rng)["trainer_name"] for _ in range(100)]
+    raw = [viewbase.encode_text(name).ljust(viewbase.PLAYER_NAME_LENGTH, b"\xFF") for name in names]
+    per = number // 100
+
+    print("text (7 character trainer names)")
+    report("decode (reference)", timeit.timeit(lambda: [decode_text_reference(r) for r in raw], number=per), per * 100, "name")
+    report("decode_text", timeit.timeit(lambda: [viewbase.decode_text(r) for r in raw], number=per), per * 100, "name")
+    report("decode_texts (bulk)", timeit.timeit(lambda: viewbase.decode_texts(raw), number=per), per * 100, "name")
+    report("encode (reference)", timeit.timeit(lambda: [encode_text_reference(n) for n in names], number=per), per * 100, "name")
+    report("encode_text", timeit.timeit(lambda: [viewbase.encode_text(n) for n in names], number=per), per * 100, "name")
+    report("encode_texts (bulk)", timeit.timeit(lambda: viewbase.encode_texts(names), number=per), per * 100, "name")
+
+
+def bench_memory(buf, copies=500):
+    save = viewbase.parse_full_save(buf).get_active()
+    version = viewbase.getVersion(save)
+
+    def measure(load):
+        tracemalloc.start()
+        kept = [load() for _ in range(copies)]
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del kept
+        return size / (copies * 20)
+
+    records = measure(lambda: viewbase.get_all_bases_from_save(save, version))
+    dicts = measure(lambda: [base.to_dict() for base in viewbase.get_all_bases_from_save(save, version)])
+
+    print("memory (per loaded base)")
+    print(f"  {'dict (to_dict)':<28} {dicts:10.0f} bytes")
+    print(f"  {'SecretBase':<28} {records:10.0f} bytes")
+
+
+def open_file_reference(path):
+    # What App.open_file used to do: parse the file twice and pick the
+    # active half with two which_save calls.
+    fullsave = viewbase.load_full_save(path)
+    buf = viewbase.read_save_file(path)
+    save_a = viewbase.read_save(buf, viewbase.SAVE_A_OFFSET)
+    save_b = viewbase.read_save(buf, viewbase.SAVE_B_OFFSET)
+    viewbase.which_save(save_a, save_b)
+    save = save_a if viewbase.which_save(save_a, save_b) == 'A' else save_b
+    return fullsave, save
+
+
+def open_file_single_pass(path):
+    fullsave = viewbase.load_full_save(path)
+    return fullsave, fullsave.get_active()
+
+
+def drop_cache(path):
+    # Asks the kernel to forget the file's cached pages so the next read has
+    # to go to the disk. Returns False where that isn't possible.
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+    return True
+
+
+def time_cold(open_file, path, number):
+    # Total time of number opens, each with the page cache dropped first.
+    # The dropping itself isn't timed.
+    total = 0.0
+    for _ in range(number):
+        drop_cache(path)
+        start = time.perf_counter()
+        open_file(path)
+        total += time.perf_counter() - start
+    return total
+
+
+def bench_open(buf, number=2000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sav")
+        with open(path, "wb") as f:
+            f.write(buf)
+
+        print("open (load and pick the active half)")
+        report("load twice (reference)", timeit.timeit(lambda: open_file_reference(path), number=number), number, "open")
+        report("load once", timeit.timeit(lambda: open_file_single_pass(path), number=number), number, "open")
+
+        if not drop_cache(path):
+            print("  cold opens: skipped (posix_fadvise not available)")
+            return
+        cold = max(number // 10, 1)
+        report("cold, load twice (reference)", time_cold(open_file_reference, path, cold), cold, "open")
+        report("cold, load once", time_cold(open_file_single_pass, path, cold), cold, "open")
+
+
+def write_reference(fullsave, path):
+    # What TrainerEdit.save used to do: build the whole file, then write it
+    # over the old one in place.
+    with open(path, 'wb+') as f:
+        f.write(bytes(fullsave))
+
+
+def bench_write(buf, number=200):
+    fullsave = viewbase.parse_full_save(buf)
+
+    def peak(write, path):
+        tracemalloc.start()
+        write(fullsave, path)
+        size = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return size
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sav")
+        write_reference(fullsave, path)
+
+        print("write (whole .sav file)")
+        report("bytes() + write (reference)", timeit.timeit(lambda: write_reference(fullsave, path), number=number), number, "save")
+        report("write_full_save (fsync)", timeit.timeit(lambda: viewbase.write_full_save(fullsave, path), number=number), number, "save")
+        print(f"  {'peak memory (reference)':<28} {peak(write_reference, path):10,} bytes")
+        print(f"  {'peak memory (streaming)':<28} {peak(viewbase.write_full_save, path):10,} bytes")
+        with open(path, "rb") as f:
+            assert f.read() == bytes(fullsave)
+
+        # One base edited: only its section and footer need to go to disk.
+        save = fullsave.get_active()
+        version = viewbase.getVersion(save)
+        base = viewbase.get_all_bases_from_save(save, version)[0]
+        base['decoration_positions'][0] = (15, 15)
+        edited = viewbase.insert_halfsave_to_save(fullsave, viewbase.insert_base_to_save(save, base, 0, version))
+        written = viewbase.patch_full_save(path, fullsave, edited)
+
+        def patch_back_and_forth():
+            # The file has to hold the original for each patch, so undo it
+            # every other time.
+            viewbase.patch_full_save(path, edited, fullsave)
+            viewbase.patch_full_save(path, fullsave, edited)
+
+        report("patch_full_save (1 base)", timeit.timeit(patch_back_and_forth, number=number // 2), number // 2 * 2, "save")
+        print(f"  {'bytes written (patch)':<28} {written:10,} of {len(buf):,}")
+        with open(path, "rb") as f:
+            assert f.read() == bytes(edited)
+
+
+def bench_draw(buf, number=200):
+    # Needs a display; the editor's images are only loaded through Tk.
+    import tkinter as tk
+    import baseedit
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"draw: skipped ({e})")
+        return
+    root.withdraw()
+
+    save = viewbase.parse_full_save(buf).get_active()
+    version = viewbase.getVersion(save)
+    base = next(
+        base for base in viewbase.get_all_bases_from_save(save, version)
+        if BASE_LAYOUTS[BASE_NAMES_REV[base['secret_base_id']]] != "None"
+    )
+    canvas = baseedit.EditCanvas(root, scale=2)
+    canvas.load_and_draw(base)
+    root.update_idletasks()
+
+    # Count the canvas calls each step makes, to see how many items a step
+    # touches.
+    calls = [0]
+
+    def counted(method):
+        def call(*args, **kwargs):
+            calls[0] += 1
+            return method(*args, **kwargs)
+        return call
+
+    for name in ("create_image", "create_rectangle", "delete", "itemconfigure", "coords", "tag_raise"):
+        setattr(canvas.canvas, name, counted(getattr(canvas.canvas, name)))
+
+    def calls_per_step(run):
+        calls[0] = 0
+        run()
+        return calls[0] / len(points)
+
+    # A drag across the room, one grid cell per step, of the first
+    # decoration the base has.
+    slot = next(i for i, decor in enumerate(base['decorations']) if decor != "DECOR_NONE")
+    tile = 16 * canvas.scale
+    start = canvas.base['decoration_positions'][slot]
+    points = [((i % 8) * tile, (i // 8 % 8) * tile) for i in range(1, 64)]
+
+    def commit(clear):
+        # What every motion event used to cost: write the position to the
+        # base and draw it.
+        for x, y in points:
+            if clear:
+                baseedit.IMAGE_CACHE.clear()
+            canvas.base['decoration_positions'][slot] = (start[0] + x // tile, start[1] + y // tile)
+            canvas.select(slot)
+            root.update_idletasks()
+
+    def ghost():
+        # What a drag tick costs now: move the ghost, leave the base alone.
+        canvas.selected_decor_idx = slot
+        canvas._drag_start_grid = (0, 0)
+        canvas._drag_start_decor_pos = start
+        for point in points:
+            canvas.drag_pointer = point
+            canvas.drag_step()
+            root.update_idletasks()
+        canvas.drag_pointer = None
+        canvas.end_drag(None)
+        root.update_idletasks()
+
+    print(f"draw ({len(points)} drag steps, scale {canvas.scale})")
+    report("draw() decoding every image", timeit.timeit(lambda: commit(True), number=max(number // 20, 1)), max(number // 20, 1) * len(points), "step")
+    baseedit.IMAGE_CACHE.clear()
+    report("draw() with image cache", timeit.timeit(lambda: commit(False), number=number // 4), number // 4 * len(points), "step")
+    report("drag tick (ghost only)", timeit.timeit(ghost, number=number // 4), number // 4 * len(points), "step")
+    print(f"  {'canvas calls (draw)':<28} {calls_per_step(lambda: commit(False)):10.1f} per step")
+    print(f"  {'canvas calls (ghost)':<28} {calls_per_step(ghost):10.1f} per step")
+    cache = baseedit.IMAGE_CACHE
+    print(f"  {'cache hits / misses':<28} {cache.hits:10,} / {cache.misses:,}")
+    print(f"  {'draws requested / coalesced':<28} {canvas.draw_requests:10,} / {canvas.redraws_coalesced:,}")
+    root.destroy()
+
+
+BENCHMARKS = {
+    "checksum": bench_checksum,
+    "open": bench_open,
+    "records": bench_records,
+    "memory": bench_memory,
+    "listing": bench_listing,
+    "hashes": bench_hashes,
+    "text": bench_text,
+    "write": bench_write,
+    "draw": bench_draw,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--save", help="path to a .sav file to benchmark against")
+    args = parser.parse_args()
+
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r}")
+
+    if args.save:
+        buf = viewbase.read_save_file(args.save)
+    else:
+        buf = make_synthetic_save()
+
+    for name in args.names or BENCHMARKS:
+        BENCHMARKS[name](buf)
+
+
+if __name__ == "__main__":
+    main()
@@ -248,6 +248,8 @@ NAMES = {
 
 NAMES_REV = {v: k for k, v in NAMES.items()}
 
+DECORATION_IDS = {name: i for i, name in enumerate(DECORATIONS)}
+
 SIZES = {
     "DECOR_NONE": (1, 1),
     "DECOR_ATTRACT_MAT": (3, 3),
@@ -0,0 +1,122 @@
+"""Extract secret bases from directories of .sav files without the GUI.
+
+Usage: python extract.py [-o bases.jsonl | --store DIR] [-j JOBS] PATH [PATH ...]
+
+Every non-empty base is written as one JSON line:
+
+    {"source": "saves/a.sav", "slot": 3, "version": "emerald", "base": {...}}
+
+where "base" is in the same format as the editor's JSON export. Slots in a
+damaged part of a save are skipped and the damage is reported on stderr, so
+stdout only ever holds JSON lines. With --store, bases go into a
+content-addressed store instead (see basestore.py), keyed in the manifest by
+source file and slot. This module never imports tkinter, so it runs on
+headless machines.
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import viewbase
+from basestore import BaseStore
+
+
+SAVE_EXTENSIONS = (".sav",)
+
+
+def find_saves(paths, extensions=SAVE_EXTENSIONS):
+    # Yields every save file under paths in a stable order. Paths that are
+    # files are yielded as they are.
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for fn in sorted(files):
+                if fn.lower().endswith(extensions):
+                    yield os.path.join(root, fn)
+
+
+def load_bases(path, problems=None):
+    # Returns (fullsave, version, bases) for a save, with bases empty for
+    # games that have no secret bases. Damaged sections are reported as in
+    # viewbase.check_section.
+    fullsave = viewbase.load_full_save(path)
+    save = fullsave.get_active()
+    version = viewbase.getVersion(save)
+    if version not in ('emerald', 'ruby/sapphire'):
+        return fullsave, version, []
+    return fullsave, version, viewbase.get_all_bases_from_save(save, version, lazy=True, problems=problems)
+
+
+def extract_file(path):
+    # Runs in a worker process. Returns (path, records, problems, error) so
+    # one bad file doesn't stop the batch.
+    problems = []
+    try:
+        fullsave, version, bases = load_bases(path, problems)
+        records = [
+            {
+                "source": path,
+                "slot": slot,
+                "version": version,
+                "base": base.to_dict(),
+            }
+            for slot, base in enumerate(bases)
+            if base is not None and base['trainer_name']
+        ]
+    except Exception as e:
+        return path, [], problems, f"{type(e).__name__}: {e}"
+    return path, records, problems, None
+
+
+def extract(paths, out, jobs=None, store=None):
+    # Writes one JSON line per base to out as soon as each file is done, or
+    # adds it to store if one is given. Returns (files, bases, errors).
+    files = bases = errors = 0
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for path, records, problems, error in executor.map(extract_file, find_saves(paths), chunksize=16):
+            files += 1
+            for problem in problems:
+                print(f"{path}: {problem['message']}", file=sys.stderr)
+            if error is not None:
+                errors += 1
+                print(f"{path}: {error}", file=sys.stderr)
+                continue
+            for record in records:
+                if store is not None:
+                    store.add(record["source"], record["slot"], record["base"])
+                else:
+                    out.write(json.dumps(record, ensure_ascii=False))
+                    out.write("\n")
+            bases += len(records)
+    if store is not None:
+        store.save_manifest()
+    return files, bases, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help=".sav files or directories to search")
+    parser.add_argument("-o", "--output", help="JSONL file to write (default: stdout)")
+    parser.add_argument("--store", help="write to a content-addressed store in this folder instead")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    if args.store:
+        files, bases, errors = extract(args.paths, None, args.jobs, BaseStore(args.store))
+    elif args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            files, bases, errors = extract(args.paths, out, args.jobs)
+    else:
+        files, bases, errors = extract(args.paths, sys.stdout, args.jobs)
+
+    print(f"{bases} bases from {files} files ({errors} failed)", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -376,4 +376,9 @@ ITEMS = [
     'Sapphire',
     'Magma Emblem',
     'Old Sea Map'
-]
\ No newline at end of file
+]
+
+
+# Several unused slots share the same name; like ITEMS.index, map each
+# name to the first slot that has it.
+ITEM_IDS = {name: i for i, name in reversed(list(enumerate(ITEMS)))}
@@ -771,4 +771,8 @@ MOVES = [
     'Water Pulse',
     'Doom Desire',
     'Psycho Boost'
-]
\ No newline at end of file
+]
+
+
+POKEMON_IDS = {name: i for i, name in enumerate(POKEMON)}
+MOVE_IDS = {name: i for i, name in enumerate(MOVES)}
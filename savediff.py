@@ -0,0 +1,242 @@
+"""Show what changed between .sav files.
+
+Usage:
+    python savediff.py OLD.sav NEW.sav
+    python savediff.py OLD.sav NEW.sav [NEW.sav ...] [-j JOBS] [--json]
+
+The active halves of the two saves are compared section by section (matched
+by section id, so rotation doesn't matter). Sections whose stored checksum
+and save index are the same are taken as unchanged without looking at their
+data unless --exact is given; the others are byte-compared. If a secret base
+section changed, the bases in it are compared slot by slot and the changed
+fields are listed.
+
+With more than one NEW file, each is diffed against OLD in parallel.
+"""
+import argparse
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import viewbase
+
+
+BASE_VERSIONS = ('emerald', 'ruby/sapphire')
+BASE_SECTIONS = (2, 3)
+
+
+def changed_bytes(a, b):
+    # (count, first, last) of the bytes that differ between two equal length
+    # buffers, or None if they are the same.
+    a = bytes(a)
+    b = bytes(b)
+    if a == b:
+        return None
+    diff = (int.from_bytes(a, 'little') ^ int.from_bytes(b, 'little')).to_bytes(len(a), 'little')
+    first = len(diff) - len(diff.lstrip(b'\x00'))
+    last = len(diff.rstrip(b'\x00')) - 1
+    return len(diff) - diff.count(0), first, last
+
+
+def diff_sections(old, new, exact=False):
+    # Compares two HalfSaves. Returns a list of dicts, one per changed
+    # section, in section id order.
+    changes = []
+    for section in sorted(new.sections, key=lambda s: s.section_id):
+        try:
+            before = old.section_by_id(section.section_id)
+        except KeyError:
+            changes.append({"section_id": section.section_id, "missing": True})
+            continue
+        if before is section or before.data is section.data:
+            continue
+
+        same_footer = (
+            before.checksum == section.checksum
+            and before.save_index == section.save_index
+            and before.signature == section.signature
+        )
+        if same_footer and not exact:
+            continue
+
+        changed = changed_bytes(before.data, section.data)
+        if changed is None and same_footer:
+            continue
+
+        change = {
+            "section_id": section.section_id,
+            "save_index": [before.save_index, section.save_index],
+            "checksum": [before.checksum, section.checksum],
+        }
+        if before.signature != section.signature:
+            change["signature"] = [before.signature, section.signature]
+        if changed is not None:
+            change["bytes_changed"], change["first"], change["last"] = changed
+        changes.append(change)
+    return changes
+
+
+def diff_fields(old, new, prefix=""):
+    # {key: [old, new]} for every export field that differs. Lists are
+    # compared item by item, so a changed party member shows up as e.g.
+    # "party[0].level" rather than the whole party.
+    changes = {}
+    for key in old:
+        before, after = old[key], new[key]
+        if before == after:
+            continue
+        name = prefix + key
+        if isinstance(before, list) and len(before) == len(after):
+            for i, (a, b) in enumerate(zip(before, after)):
+                if a == b:
+                    continue
+                if isinstance(a, dict):
+                    changes.update(diff_fields(a, b, f"{name}[{i}]."))
+                else:
+                    changes[f"{name}[{i}]"] = [a, b]
+        else:
+            changes[name] = [before, after]
+    return changes
+
+
+def diff_bases(old, new, version):
+    # Compares the base slots of two HalfSaves of the same version. Only
+    # slots whose raw records differ are decoded.
+    old_sections = {section_id: old.section_by_id(section_id) for section_id in BASE_SECTIONS}
+    new_sections = {section_id: new.section_by_id(section_id) for section_id in BASE_SECTIONS}
+
+    changes = []
+    for index, spans in enumerate(viewbase.get_layout(version).spans):
+        before = viewbase.read_record(old_sections, spans)
+        after = viewbase.read_record(new_sections, spans)
+        if before == after:
+            continue
+        fields = diff_fields(
+            viewbase.decode_secret_base(before).to_dict(),
+            viewbase.decode_secret_base(after).to_dict(),
+        )
+        changes.append({"slot": index, "fields": fields})
+    return changes
+
+
+def diff_saves(old, new, exact=False):
+    # Compares the active halves of two FullSaves.
+    old_save = old.get_active()
+    new_save = new.get_active()
+    result = {
+        "active": [old.active, new.active],
+        "sections": diff_sections(old_save, new_save, exact),
+        "bases": [],
+    }
+
+    changed_ids = {change["section_id"] for change in result["sections"]}
+    if changed_ids.intersection(BASE_SECTIONS):
+        old_version = viewbase.getVersion(old_save)
+        new_version = viewbase.getVersion(new_save)
+        result["version"] = [old_version, new_version]
+        if old_version == new_version and new_version in BASE_VERSIONS:
+            result["bases"] = diff_bases(old_save, new_save, new_version)
+    return result
+
+
+def diff_against(old, new_path, exact=False):
+    # Returns (path, result, error) so one bad file doesn't stop the rest.
+    try:
+        result = diff_saves(old, viewbase.load_full_save(new_path), exact)
+    except Exception as e:
+        return new_path, None, f"{type(e).__name__}: {e}"
+    return new_path, result, None
+
+
+def load_old(old_path):
+    # Returns (fullsave, error).
+    try:
+        return viewbase.load_full_save(old_path), None
+    except Exception as e:
+        return None, f"{old_path}: {type(e).__name__}: {e}"
+
+
+def diff_files(old_path, new_path, exact=False):
+    old, error = load_old(old_path)
+    if error is not None:
+        return new_path, None, error
+    return diff_against(old, new_path, exact)
+
+
+# (fullsave, error) for OLD in each worker process, set once by init_worker.
+_old = (None, None)
+
+
+def init_worker(old_path):
+    global _old
+    _old = load_old(old_path)
+
+
+def diff_with_old(new_path, exact=False):
+    old, error = _old
+    if error is not None:
+        return new_path, None, error
+    return diff_against(old, new_path, exact)
+
+
+def diff_many(old_path, new_paths, jobs=None, exact=False):
+    # Yields diff_files results for each of new_paths, in order. OLD is read
+    # once per worker, not once per file.
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(old_path,)) as executor:
+        yield from executor.map(partial(diff_with_old, exact=exact), new_paths, chunksize=16)
+
+
+def format_diff(old_path, new_path, result):
+    lines = [f"--- {old_path}", f"+++ {new_path}"]
+    if result["active"][0] != result["active"][1]:
+        lines.append(f"active save: {result['active'][0]} -> {result['active'][1]}")
+    for change in result["sections"]:
+        if change.get("missing"):
+            lines.append(f"section {change['section_id']}: missing from {old_path}")
+            continue
+        line = (
+            f"section {change['section_id']}:"
+            f" save_index {change['save_index'][0]} -> {change['save_index'][1]},"
+            f" checksum {change['checksum'][0]:04X} -> {change['checksum'][1]:04X}"
+        )
+        if "bytes_changed" in change:
+            line += f", {change['bytes_changed']} bytes changed in {change['first']:#x}-{change['last']:#x}"
+        lines.append(line)
+    for change in result["bases"]:
+        lines.append(f"base {change['slot']}:")
+        for key, (before, after) in change["fields"].items():
+            lines.append(f"  {key}: {before!r} -> {after!r}")
+    if len(lines) == 2:
+        lines.append("no changes")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("old")
+    parser.add_argument("new", nargs="+")
+    parser.add_argument("--exact", action="store_true", help="byte-compare sections even if their checksums match")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per file")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes when diffing many files (default: all cores)")
+    args = parser.parse_args(argv)
+
+    if len(args.new) == 1:
+        results = [diff_files(args.old, args.new[0], args.exact)]
+    else:
+        results = diff_many(args.old, args.new, args.jobs, args.exact)
+
+    errors = 0
+    for path, result, error in results:
+        if error is not None:
+            errors += 1
+            print(f"{path}: {error}", file=sys.stderr)
+        elif args.json:
+            print(json.dumps({"old": args.old, "new": path, **result}, ensure_ascii=False))
+        else:
+            print(format_diff(args.old, path, result))
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
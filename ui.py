@@ -9,6 +9,7 @@ from tkinter import filedialog, messagebox
 
 import viewbase
 from baseedit import EditCanvas, draw_base
+from basestore import BaseStore, trainer_label
 from baseinfo import BASE_NAMES, BASE_NAMES_REV
 from widgets.canvasbutton import CanvasButton
 from items import ITEMS
@@ -45,6 +46,7 @@ class TrainerEdit(tk.Frame):
         self.parent = parent
         self.old_index = None
         self.active_idx = None
+        self.unreadable = set()
         self.grid_columnconfigure(1, weight=0)
         self.grid_columnconfigure(2, weight=1)
 
@@ -161,7 +163,10 @@ class TrainerEdit(tk.Frame):
         self.classVar.set(TRAINER_CLASSES[classIndex])
 
     def load_bases(self, bases):
-        self.bases = bases
+        # Slots that couldn't be read (None) get an empty stand-in so they
+        # can still be shown, but they are never written back; see save.
+        self.unreadable = {i for i, base in enumerate(bases) if base is None}
+        self.bases = [viewbase.SecretBase() if base is None else base for base in bases]
 
     def on_baseVar_change(self):
         self.editCanvas.load_and_draw(self.get_base_from_inputs())
@@ -293,23 +298,35 @@ class TrainerEdit(tk.Frame):
 
         self.load_base(self.active_idx)
 
-        newhsave = self.parent.save
+        newhsave = self.parent.save.copy()
 
         version = viewbase.getVersion(newhsave)
 
-        for i in range(20):
-            newhsave = viewbase.insert_base_to_save(newhsave, self.bases[i], i, version)
+        # only bases edited since the last save need encoding; the rest are
+        # already in the save as they are. slots that couldn't be read are
+        # left alone, so the damaged section keeps its bad checksum
+        changed = [(i, base) for i, base in enumerate(self.bases) if base.dirty and i not in self.unreadable]
+        skipped = [str(i + 1) for i, base in enumerate(self.bases) if base.dirty and i in self.unreadable]
+        if skipped:
+            messagebox.showwarning("Warning", f"Base {', '.join(skipped)} could not be read from the save and will not be saved.")
+        viewbase.write_bases_to_save(newhsave, changed, version)
 
         fullsave = viewbase.insert_halfsave_to_save(self.parent.fullsave, newhsave)
 
         try:
-            with open(fn, 'wb+') as f:
-                f.write(bytes(fullsave))
+            viewbase.write_full_save(fullsave, fn)
             print(f"Saved to {fn}")
         except OSError:
             # this could be a permission error, or a file in use error
             # use a dialog to show the error
             messagebox.showerror("Error", "Could not save file. Is it open in another program?")
+            return
+
+        # later saves start from what was just written
+        self.parent.save = newhsave
+        self.parent.fullsave = fullsave
+        for _, base in changed:
+            base.mark_clean()
 
     def save_base(self, idx, folder_path):
         self.set_party_display(self.partyButtons.active)
@@ -321,7 +338,7 @@ class TrainerEdit(tk.Frame):
         fn = f"{folder_path}/{self.bases[idx]['trainer_name']} ({self.bases[idx]['id']}) - {lh} - {th}.json"
 
         with open(fn, 'w+') as f:
-            f.write(json.dumps(self.bases[idx], indent=4))
+            f.write(json.dumps(self.bases[idx].to_dict(), indent=4))
 
         print(f"Saved to {fn}")
 
@@ -330,9 +347,25 @@ class TrainerEdit(tk.Frame):
         for i in range(20):
             self.save_base(i, folder_path)
 
+    def save_all_bases_to_store(self, folder_path):
+        # content-addressed export: bases already in the store aren't written again
+        self.set_party_display(self.partyButtons.active)
+
+        self.load_base(self.active_idx)
+
+        store = BaseStore(folder_path)
+        written = 0
+        for i, base in enumerate(self.bases):
+            if base['trainer_name']:
+                record = base.to_dict()
+                written += store.add(trainer_label(record), i, record)[1]
+        store.save_manifest()
+
+        print(f"Saved {written} new bases to {folder_path}")
+
     def import_base(self, fn):
         with open(fn, 'r') as f:
-            imported_base = json.load(f)
+            imported_base = viewbase.SecretBase.from_dict(json.load(f))
 
         idx = self.active_idx
         self.bases[self.active_idx] = imported_base
@@ -446,6 +479,7 @@ class App(tk.Tk):
         self.file_menu.add_command(label="Save File...", command=self.save_file_dialog, underline=0)
         self.file_menu.add_command(label="Export Base...", command=self.save_base_dialog, underline=0)
         self.file_menu.add_command(label="Export All Bases...", command=self.save_all_bases_dialog, underline=7)
+        self.file_menu.add_command(label="Export All Bases To Store...", command=self.save_all_bases_to_store_dialog, underline=22)
         self.file_menu.add_command(label="Import Base...", command=self.import_base_dialog, underline=0)
 
         if PIL_AVAILABLE:
@@ -479,7 +513,9 @@ class App(tk.Tk):
             self.treeview.delete(i)
 
         for i, base in enumerate(bases):
-            if not base['trainer_name']:
+            if i in self.edit.unreadable:
+                self.treeview.insert('', 'end', text=f"{i+1}: Base {i+1} (unreadable)")
+            elif not base['trainer_name']:
                 self.treeview.insert('', 'end', text=f"{i+1}: Base {i+1}")
             else:
                 self.treeview.insert('', 'end', text=f"{i+1}: {base['trainer_name']} ({base['id']})")
@@ -518,22 +554,29 @@ class App(tk.Tk):
     def open_file(self, file_path):
         try:
             fullsave = viewbase.load_full_save(file_path)
-            save = viewbase.load_save(file_path)
         except FileNotFoundError:
             pass
         else:
+            save = fullsave.get_active()
+            print('Using save ' + fullsave.active)
+
             self.save = save
             self.fullsave = fullsave
             version = viewbase.getVersion(save)
             
             match version:
                 case 'emerald' | 'ruby/sapphire':
-                    bases = viewbase.get_all_bases_from_save(save, version)
+                    problems = []
+                    bases = viewbase.get_all_bases_from_save(save, version, lazy=True, problems=problems)
 
                     self.edit.active_idx = None
                     self.edit.load_bases(bases)
                     self.edit.load_base(0)
 
+                    if problems:
+                        details = "\n".join(problem["message"] for problem in problems)
+                        messagebox.showwarning("Warning", f"Some bases are in a damaged part of the save and could not be read. They will not be saved.\n\n{details}")
+
                     # add to recent files
                     if file_path in self.settings['recent_files']:
                         self.settings['recent_files'].remove(file_path)
@@ -563,6 +606,10 @@ class App(tk.Tk):
         folder_path = filedialog.askdirectory()
         self.edit.save_all_bases(folder_path)
 
+    def save_all_bases_to_store_dialog(self):
+        folder_path = filedialog.askdirectory()
+        self.edit.save_all_bases_to_store(folder_path)
+
     def import_base_dialog(self):
         file_path = filedialog.askopenfilename(title="Import Base", filetypes=[("JSON", "*.json")])
         self.edit.import_base(file_path)
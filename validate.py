@@ -0,0 +1,174 @@
+"""Check .sav files for damage and report every problem found.
+
+Usage: python validate.py [-j JOBS] [--failed] PATH [PATH ...]
+
+Each save gets one JSON line:
+
+    {"path": "saves/a.sav", "ok": false, "size": 131072, "active": "B",
+     "halves": {"A": {...}, "B": {...}},
+     "problems": [{"half": "B", "section_id": 3, "check": "checksum", "message": "..."}]}
+
+Both halves are checked for section signatures, missing, duplicate or
+out-of-place section ids, a save_index that differs between sections, and
+checksums. In halves from a game with Secret Bases, all 20 base records are
+decoded as well. Directories are searched for saves and files are checked in
+parallel.
+"""
+import argparse
+import json
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import viewbase
+from extract import find_saves
+
+
+BASE_VERSIONS = ('emerald', 'ruby/sapphire')
+HALVES = (('A', viewbase.SAVE_A_OFFSET), ('B', viewbase.SAVE_B_OFFSET))
+
+
+def problem(problems, check, message, half=None, section_id=None, slot=None):
+    entry = {"half": half, "check": check, "message": message}
+    if section_id is not None:
+        entry["section_id"] = section_id
+    if slot is not None:
+        entry["slot"] = slot
+    problems.append(entry)
+
+
+def validate_sections(save, half, problems):
+    # Checks one HalfSave's footers and checksums. Returns the sections that
+    # are safe to read by id, or None if the half has never been written.
+    signed = [section for section in save.sections if section.signature == viewbase.SECTION_SIGNATURE]
+    if not signed:
+        return None
+
+    for i, section in enumerate(save.sections):
+        if section.signature != viewbase.SECTION_SIGNATURE:
+            problem(problems, "signature", f"section {i} has signature {section.signature:#010x}", half, section.section_id)
+
+    # Sections are only read by id if exactly one has that id.
+    counts = Counter(section.section_id for section in save.sections)
+    by_id = {}
+    for section in save.sections:
+        if section.section_id >= viewbase.SECTION_COUNT:
+            problem(problems, "section_id", f"unknown section id {section.section_id}", half, section.section_id)
+        elif counts[section.section_id] == 1:
+            by_id[section.section_id] = section
+    for section_id in range(viewbase.SECTION_COUNT):
+        if counts[section_id] > 1:
+            problem(problems, "section_id", f"section id {section_id} appears {counts[section_id]} times", half, section_id)
+        elif not counts[section_id]:
+            problem(problems, "section_id", f"section id {section_id} is missing", half, section_id)
+
+    save_index = save.sections[0].save_index
+    for section in save.sections:
+        if section.save_index != save_index:
+            problem(
+                problems, "save_index",
+                f"save_index {section.save_index} differs from {save_index} in the first section",
+                half, section.section_id,
+            )
+        elif section.section_id in by_id and save.sections[(save_index + section.section_id) % viewbase.SECTION_COUNT] is not section:
+            problem(problems, "rotation", f"section id {section.section_id} is out of place for save_index {save_index}", half, section.section_id)
+
+    bad = set()
+    for section_id, section in by_id.items():
+        checksum = viewbase.checksum_section(section.data, section_id)
+        if checksum != section.checksum:
+            problem(problems, "checksum", f"stored checksum {section.checksum:04X}, computed {checksum:04X}", half, section_id)
+            bad.add(section_id)
+    return {section_id: section for section_id, section in by_id.items() if section_id not in bad}
+
+
+def validate_bases(sections, version, half, problems):
+    # Decodes all 20 base records from sections 2 and 3.
+    if 2 not in sections or 3 not in sections:
+        problem(problems, "base", "base sections are missing or damaged", half)
+        return
+    for index, spans in enumerate(viewbase.get_layout(version).spans):
+        record = viewbase.read_record(sections, spans)
+        try:
+            viewbase.decode_secret_base(record).to_dict()
+        except (ValueError, KeyError, IndexError) as e:
+            problem(problems, "base", f"{type(e).__name__}: {e}", half, slot=index)
+
+
+def validate_buffer(buf):
+    # Validates a whole save file held in buf. Returns the report without
+    # its "path".
+    problems = []
+    report = {"ok": True, "size": len(buf), "active": None, "halves": {}, "problems": problems}
+
+    if len(buf) != viewbase.FULL_SAVE_SIZE:
+        problem(problems, "size", f"file is {len(buf)} bytes, expected {viewbase.FULL_SAVE_SIZE}")
+
+    saves = {}
+    for half, offset in HALVES:
+        if len(buf) < offset + viewbase.SAVE_SIZE:
+            problem(problems, "size", "file is too short to hold this half", half)
+            continue
+        save = viewbase.read_save(buf, offset)
+        info = {"save_index": save.sections[0].save_index, "empty": False, "version": None}
+        report["halves"][half] = info
+
+        sections = validate_sections(save, half, problems)
+        if sections is None:
+            info["empty"] = True
+            continue
+        saves[half] = save
+
+        if 0 in sections and sections[0] is save.sections[info["save_index"] % viewbase.SECTION_COUNT]:
+            info["version"] = viewbase.getVersion(save)
+        if info["version"] in BASE_VERSIONS:
+            validate_bases(sections, info["version"], half, problems)
+
+    if len(saves) == 2:
+        report["active"] = viewbase.which_save(saves['A'], saves['B'])
+    elif saves:
+        report["active"] = next(iter(saves))
+    else:
+        problem(problems, "empty", "neither half holds a save")
+
+    report["ok"] = not problems
+    return report
+
+
+def validate_file(path):
+    # Runs in a worker process.
+    try:
+        buf = viewbase.read_save_file(path)
+    except OSError as e:
+        return {"path": path, "ok": False, "problems": [{"half": None, "check": "read", "message": str(e)}]}
+    return {"path": path, **validate_buffer(buf)}
+
+
+def validate_many(paths, jobs=None):
+    # Yields a report for every save under paths, in order.
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(validate_file, find_saves(paths), chunksize=16)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help=".sav files or directories to search")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--failed", action="store_true", help="only report saves with problems")
+    args = parser.parse_args(argv)
+
+    files = failed = 0
+    for report in validate_many(args.paths, args.jobs):
+        files += 1
+        if not report["ok"]:
+            failed += 1
+        elif args.failed:
+            continue
+        print(json.dumps(report, ensure_ascii=False))
+
+    print(f"{files} saves checked, {failed} with problems", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
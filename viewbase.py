@@ -1,13 +1,27 @@
+import os
+import stat
 import struct
+import sys
+import tempfile
+import warnings
+from array import array
+from collections.abc import MutableMapping, Sequence
 from copy import deepcopy
+from dataclasses import dataclass, field
 from hashlib import md5
-from io import BytesIO
 from enum import IntEnum
+from operator import attrgetter
 
 from baseinfo import BASE_NAMES, BASE_NAMES_REV
-from decors import DECORATIONS
-from items import ITEMS
-from pokemon import MOVES, POKEMON
+from decors import DECORATION_IDS, DECORATIONS
+from items import ITEM_IDS, ITEMS
+from pokemon import MOVE_IDS, MOVES, POKEMON, POKEMON_IDS
+
+try:
+    import numpy
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
 
 
 class Language(IntEnum):
@@ -31,9 +45,21 @@ SAVE_B_OFFSET = 0xE000
 SECTION_SIZE = 3968
 SECTION_SKIP = 116 # bytes
 
+# section_id, checksum, signature, save_index
+SECTION_FOOTER = struct.Struct("<HHII")
+# Every section the game has written carries this signature.
+SECTION_SIGNATURE = 0x08012025
+SECTION_STRIDE = SECTION_SIZE + SECTION_SKIP + SECTION_FOOTER.size
+SECTION_PADDING = bytes(SECTION_SKIP)
+
+EXTRA_SECTIONS_SIZE = 4096 * 4
+FULL_SAVE_SIZE = SAVE_SIZE * 2 + EXTRA_SECTIONS_SIZE
+
 
 class Section:
     def __init__(self, data, section_id, checksum, signature, save_index):
+        # data is usually a read-only memoryview into the buffer the save was
+        # loaded from; writers work on a private bytearray copy instead.
         self.data = data
         self.section_id = section_id
         self.checksum = checksum
@@ -41,32 +67,79 @@ class Section:
         self.save_index = save_index
 
     def __bytes__(self):
+        return b"".join(self.chunks())
+
+    def chunks(self):
+        # The pieces of the section as it is laid out in the file, without
+        # joining them.
         return (
-            self.data
-            + b'\x00' * (SECTION_SKIP)
-            + struct.pack("<H", self.section_id)
-            + struct.pack("<H", self.checksum)
-            + struct.pack("<I", self.signature)
-            + struct.pack("<I", self.save_index)
+            self.data,
+            SECTION_PADDING,
+            SECTION_FOOTER.pack(self.section_id, self.checksum, self.signature, self.save_index),
         )
 
+    def copy(self):
+        # A private, writable copy of this section.
+        return Section(bytearray(self.data), self.section_id, self.checksum, self.signature, self.save_index)
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
     def has_valid_checksum(self):
-        data = BytesIO(self.data)
-        checksum = checksum_block(data, self.section_id)
+        checksum = checksum_section(self.data, self.section_id)
         return checksum == self.checksum
 
     def fix_checksum(self):
-        data = BytesIO(self.data)
-        checksum = checksum_block(data, self.section_id)
-        self.checksum = checksum
+        self.checksum = checksum_section(self.data, self.section_id)
 
 
 class HalfSave:
     def __init__(self, sections: list[Section]):
         self.sections = sections
+        # Indices of the sections this save has copied for itself. All other
+        # sections may be shared with the save it was copied from.
+        self._owned = set()
+        # Where each section id is in sections. The game rotates the
+        # sections on every save, so this is worked out once from the ids
+        # instead of from save_index on every lookup. Replace sections through
+        # replace_section to keep it up to date.
+        self._index_by_id = {}
+        for i, section in enumerate(sections):
+            self._index_by_id.setdefault(section.section_id, i)
+
+    def copy(self):
+        # Copy-on-write: the new save shares every section until one of the
+        # two writes to it through writable_section. Sections this save
+        # owned are now shared too, so it has to copy them again first.
+        self._owned.clear()
+        return HalfSave(list(self.sections))
+
+    def section_index(self, section_id) -> int:
+        # Raises KeyError if no section has section_id.
+        return self._index_by_id[section_id]
+
+    def section_by_id(self, section_id) -> Section:
+        return self.sections[self._index_by_id[section_id]]
+
+    def replace_section(self, i, section):
+        old_id = self.sections[i].section_id
+        if self._index_by_id.get(old_id) == i:
+            del self._index_by_id[old_id]
+        self.sections[i] = section
+        self._index_by_id.setdefault(section.section_id, i)
+
+    def writable_section(self, i) -> Section:
+        if i not in self._owned:
+            self.replace_section(i, self.sections[i].copy())
+            self._owned.add(i)
+        return self.sections[i]
 
     def __bytes__(self):
-        return b"".join(bytes(section) for section in self.sections)
+        return b"".join(self.chunks())
+
+    def chunks(self):
+        for section in self.sections:
+            yield from section.chunks()
 
 
 class FullSave:
@@ -79,34 +152,43 @@ class FullSave:
     def get_active(self):
         return self.save_a if self.active == 'A' else self.save_b
 
+    def copy(self):
+        # Shares both halves; replace a half rather than writing through it.
+        return FullSave(self.save_a, self.save_b, self.extra_sections)
+
     def __bytes__(self):
-        return bytes(self.save_a) + bytes(self.save_b) + self.extra_sections
+        return b"".join(self.chunks())
+
+    def chunks(self):
+        # The file's contents in order, as buffers that are never copied
+        # into one piece. See write_full_save.
+        yield from self.save_a.chunks()
+        yield from self.save_b.chunks()
+        yield self.extra_sections
 
+    def __deepcopy__(self, memo):
+        return FullSave(deepcopy(self.save_a, memo), deepcopy(self.save_b, memo), bytes(self.extra_sections))
 
-def read_section(f):
-    data = f.read(SECTION_SIZE)
-    f.read(SECTION_SKIP)
-    section_id = struct.unpack("<H", f.read(2))[0]
-    checksum = struct.unpack("<H", f.read(2))[0]
-    signature = struct.unpack("<I", f.read(4))[0]
-    save_index = struct.unpack("<I", f.read(4))[0]
 
-    return Section(data, section_id, checksum, signature, save_index)
+def read_section(buf, offset=0):
+    # No copy is made: the section data is a window into buf.
+    view = memoryview(buf)
+    footer = SECTION_FOOTER.unpack_from(view, offset + SECTION_SIZE + SECTION_SKIP)
+    return Section(view[offset:offset + SECTION_SIZE], *footer)
 
 
 SECTION_COUNT = 14
 
 
-def read_save(f):
+def read_save(buf, offset=0):
     sections = []
     for i in range(SECTION_COUNT):
-        sections.append(read_section(f))
+        sections.append(read_section(buf, offset + i * SECTION_STRIDE))
     return HalfSave(sections)
 
 
-def read_extra_sections(f):
-    res = f.read(4096*4)
-    return res
+def read_extra_sections(buf, offset=SAVE_SIZE * 2):
+    return memoryview(buf)[offset:offset + EXTRA_SECTIONS_SIZE]
 
 
 def decoration_xy_to_index(x, y):
@@ -120,30 +202,46 @@ def index_to_decoration_xy(index):
 
 
 def layout_hash(base):
-    # 8 byte hash of all the decorations + their positions
-    decors = base['decorations']
-    positions = base['decoration_positions']
-    decors = [DECORATIONS.index(x) for x in decors]
-    positions = [decoration_xy_to_index(x, y) for x, y in positions]
-    return md5(bytes(decors + positions)).hexdigest()[0:16]
+    # 8 byte hash of all the decorations + their positions. Cached on a
+    # SecretBase until its decorations or positions change.
+    if not isinstance(base, SecretBase):
+        return compute_layout_hash(SecretBase.from_dict(base))
+    if base._layout_hash is None:
+        base._layout_hash = compute_layout_hash(base)
+    return base._layout_hash
 
 
 def team_hash(base):
-    # 8 byte hash of the team
-    team = base['party']
+    # 8 byte hash of the team. Cached on a SecretBase until its party changes.
+    if not isinstance(base, SecretBase):
+        return compute_team_hash(SecretBase.from_dict(base))
+    if base._team_hash is None:
+        base._team_hash = compute_team_hash(base)
+    return base._team_hash
+
+
+def compute_layout_hash(base):
+    if base._pending & LAZY_BODY:
+        # The record stores the decorations and then their positions as
+        # decoration_xy_to_index bytes, which is exactly what gets hashed.
+        start = SECRET_BASE_HEADER_STRUCT.size
+        return md5(base._record[start:start + DECOR_MAX_SECRET_BASE * 2]).hexdigest()[0:16]
+    decors = list(base.decoration_ids)
+    positions = [decoration_xy_to_index(x, y) for x, y in base.decoration_positions]
+    return md5(bytes(decors + positions)).hexdigest()[0:16]
+
+
+def compute_team_hash(base):
     team = [
         [
-            int(mon['personality'], 16) if isinstance(mon['personality'], str) else mon['personality'],
-            POKEMON.index(mon['species']),
-            ITEMS.index(mon['held_item']),
-            mon['level'],
-            mon['evs'],
-            *[
-                MOVES.index(move)
-                for move in mon['moves']
-            ]
+            mon.personality_value,
+            mon.species_id,
+            mon.held_item_id,
+            mon.level,
+            mon.evs,
+            *mon.move_ids,
         ]
-        for mon in team
+        for mon in base.party
     ]
     team = [item for sublist in team for item in sublist]
     bytes = struct.pack("<" + "IHHBBHHHH" * 6, *team)
@@ -158,66 +256,67 @@ cs_byte = [
 ]
 
 
-def checksum_block(f, idx):
-    checksum = 0
-    read = 0
-    while True:
-        data = f.read(4)
-        if not data or read >= cs_byte[idx]:
-            break
-        checksum += struct.unpack("<I", data)[0]
-        checksum = (checksum & 0xFFFFFFFF)
-        read += 4
+def checksum_section(data, idx):
+    # Sum the first cs_byte[idx] bytes as little-endian u32 words in one go,
+    # then fold the 32-bit total down to 16 bits.
+    length = min(cs_byte[idx], len(data)) & ~3
+    if NUMPY_AVAILABLE:
+        words = numpy.frombuffer(data, dtype="<u4", count=length // 4)
+        checksum = int(words.sum(dtype=numpy.uint64))
+    elif sys.byteorder == "little":
+        checksum = sum(memoryview(data)[:length].cast("I"))
+    else:
+        checksum = sum(struct.unpack_from(f"<{length // 4}I", data))
+    checksum &= 0xFFFFFFFF
     result = (checksum & 0xFFFF) + (checksum >> 16)
     return result & 0xFFFF
 
 
+def checksum_block(f, idx):
+    return checksum_section(f.read(cs_byte[idx]), idx)
+
+
+# personalities, moves, species, held items, levels, evs; each field is
+# stored for all six party members before the next one starts.
+PARTY_FORMAT = (
+    f"{PARTY_SIZE}I{PARTY_SIZE * MAX_MON_MOVES}H{PARTY_SIZE}H{PARTY_SIZE}H{PARTY_SIZE}B{PARTY_SIZE}B"
+)
+PARTY_STRUCT = struct.Struct("<" + PARTY_FORMAT)
+
+
+def decode_party(values):
+    # values is the flat tuple PARTY_STRUCT unpacks to.
+    n = PARTY_SIZE
+    m = n * (1 + MAX_MON_MOVES)
+    personalities = values[0:n]
+    moves = zip(*[iter(values[n:m])] * MAX_MON_MOVES)
+    species = values[m:m + n]
+    held_items = values[m + n:m + n * 2]
+    levels = values[m + n * 2:m + n * 3]
+    evs = values[m + n * 3:m + n * 4]
+
+    return [PartyMember(*mon) for mon in zip(personalities, moves, species, held_items, levels, evs)]
+
+
+def party_values(party) -> list:
+    # The inverse of decode_party: the flat list PARTY_STRUCT packs.
+    party = [mon if isinstance(mon, PartyMember) else PartyMember.from_dict(mon) for mon in party]
+    values = [mon.personality_value for mon in party]
+    for mon in party:
+        values += mon.move_ids
+    values += [mon.species_id for mon in party]
+    values += [mon.held_item_id for mon in party]
+    values += [mon.level for mon in party]
+    values += [mon.evs for mon in party]
+    return values
+
+
 def read_party(f):
-    party = [{} for _ in range(PARTY_SIZE)]
-    for i in range(PARTY_SIZE):
-        personality = struct.unpack("<I", f.read(4))[0]
-        party[i]["personality"] = f"{personality:X}".zfill(8)
-    for i in range(PARTY_SIZE):
-        moves = [struct.unpack("<H", f.read(2))[0] for _ in range(MAX_MON_MOVES)]
-        try:
-            moves = [MOVES[move] for move in moves]
-        except:
-            pass
-        party[i]["moves"] = moves
-    for i in range(PARTY_SIZE):
-        species = struct.unpack("<H", f.read(2))[0]
-        party[i]["species"] = POKEMON[species]
-    for i in range(PARTY_SIZE):
-        held_item = ITEMS[struct.unpack("<H", f.read(2))[0]]
-        party[i]["held_item"] = held_item
-    for i in range(PARTY_SIZE):
-        level = struct.unpack("<B", f.read(1))[0]#
-        party[i]["level"] = level
-    for i in range(PARTY_SIZE):
-        evs = struct.unpack("<B", f.read(1))[0]
-        party[i]["evs"] = evs
-    return party
+    return decode_party(PARTY_STRUCT.unpack(f.read(PARTY_STRUCT.size)))
 
 
 def export_party(party: dict) -> bytes:
-    data = b""
-    for mon in party:
-        data += struct.pack("<I", int(mon["personality"], 16))
-    for mon in party:
-        for move in mon["moves"]:
-            try:
-                data += struct.pack("<H", MOVES.index(move))
-            except:
-                data += struct.pack("<H", MOVES.index('None'))
-    for mon in party:
-        data += struct.pack("<H", POKEMON.index(mon["species"]))
-    for mon in party:
-        data += struct.pack("<H", ITEMS.index(mon["held_item"]))
-    for mon in party:
-        data += struct.pack("<B", mon["level"])
-    for mon in party:
-        data += struct.pack("<B", mon["evs"])
-    return data
+    return PARTY_STRUCT.pack(*party_values(party))
 
 
 ENCODING_TABLE = [
@@ -281,108 +380,672 @@ DECOR_MAX_SECRET_BASE = 16
 MAP_OFFSET = 7
 
 
+# Joins strings for bulk translation. It is outside latin-1, so it never
+# stands for a byte, and translate passes it through unchanged.
+TEXT_SEPARATOR = "\u0100"
+
+
+class TextEncodeMap(dict):
+    # str.translate table that rejects characters the game can't display,
+    # like table.index used to.
+    def __missing__(self, key):
+        raise ValueError(f"{chr(key)!r} has no in-game character")
+
+
+def build_encode_map(table):
+    # Rules for glyphs that don't map one-to-one:
+    # - a glyph listed more than once (mostly the blank " ") encodes to the
+    #   first byte that has it;
+    # - multi-character glyphs such as "Lv" or "PK" are decode-only, the
+    #   letters in them encode on their own.
+    encode_map = TextEncodeMap()
+    for i, glyph in enumerate(table):
+        if len(glyph) == 1:
+            encode_map.setdefault(ord(glyph), chr(i))
+    encode_map[ord(TEXT_SEPARATOR)] = TEXT_SEPARATOR
+    return encode_map
+
+
+# Built once at import. Decoding reads the bytes as latin-1, which maps each
+# byte to the code point of the same value, and translates that through the
+# table; encoding does the reverse.
+DECODE_MAP = tuple(ENCODING_TABLE)
+DECODE_MAP_JP = tuple(ENCODING_TABLE_JP)
+ENCODE_MAP = build_encode_map(ENCODING_TABLE)
+ENCODE_MAP_JP = build_encode_map(ENCODING_TABLE_JP)
+
+
 def decode_text(text, language=Language.ENGLISH):
-    if language == Language.JAPANESE:
-        table = ENCODING_TABLE_JP
-    else:
-        table = ENCODING_TABLE
-    return "".join(table[c] for c in text)
+    table = DECODE_MAP_JP if language == Language.JAPANESE else DECODE_MAP
+    return bytes(text).decode("latin-1").translate(table)
 
 
 def encode_text(text, language=Language.ENGLISH):
-    if language == Language.JAPANESE:
-        table = ENCODING_TABLE_JP
-    else:
-        table = ENCODING_TABLE
-    return bytes(table.index(c) for c in text)
+    # Raises ValueError for characters the game can't display.
+    table = ENCODE_MAP_JP if language == Language.JAPANESE else ENCODE_MAP
+    return text.translate(table).encode("latin-1")
+
+
+def decode_texts(texts, language=Language.ENGLISH) -> list:
+    # Decodes many strings with a single translate call.
+    table = DECODE_MAP_JP if language == Language.JAPANESE else DECODE_MAP
+    texts = [bytes(text).decode("latin-1") for text in texts]
+    if not texts:
+        return []
+    return TEXT_SEPARATOR.join(texts).translate(table).split(TEXT_SEPARATOR)
+
+
+def encode_texts(texts, language=Language.ENGLISH) -> list:
+    # Encodes many strings with a single translate call.
+    table = ENCODE_MAP_JP if language == Language.JAPANESE else ENCODE_MAP
+    texts = list(texts)
+    if not texts:
+        return []
+    joined = TEXT_SEPARATOR.join(texts)
+    if joined.count(TEXT_SEPARATOR) != len(texts) - 1:
+        raise ValueError(f"{TEXT_SEPARATOR!r} has no in-game character")
+    return [text.encode("latin-1") for text in joined.translate(table).split(TEXT_SEPARATOR)]
+
+
+# The whole 160 byte record: base id, info bits, name, trainer id, language,
+# bases received, times entered, unused, decorations, decoration positions,
+# two bytes of padding and then the party.
+SECRET_BASE_STRUCT = struct.Struct(
+    f"<BB{PLAYER_NAME_LENGTH}sIBHBB{DECOR_MAX_SECRET_BASE}B{DECOR_MAX_SECRET_BASE}B2x" + PARTY_FORMAT
+)
+SECRET_BASE_SIZE = SECRET_BASE_STRUCT.size
+
+# The same record split in two, so a lazily decoded base can unpack the
+# header (everything a base list needs) without touching the rest.
+SECRET_BASE_HEADER_STRUCT = struct.Struct(f"<BB{PLAYER_NAME_LENGTH}sIBHBB")
+SECRET_BASE_BODY_STRUCT = struct.Struct(
+    f"<{DECOR_MAX_SECRET_BASE}B{DECOR_MAX_SECRET_BASE}B2x" + PARTY_FORMAT
+)
+
+# Byte translation tables from a packed decoration position to x and y.
+POSITION_X = bytes((d >> 4) + MAP_OFFSET for d in range(256))
+POSITION_Y = bytes((d & 0xF) + MAP_OFFSET for d in range(256))
+
+LAZY_HEADER = 0b01
+LAZY_BODY = 0b10
+
+
+def lookup_id(ids, name, kind):
+    try:
+        return ids[name]
+    except KeyError:
+        raise ValueError(f"{name!r} is not a known {kind}") from None
+
+
+class Record(MutableMapping):
+    # Record classes expose the same keys as the dicts bases used to be, so
+    # base['party'][0]['species'] keeps working, but store compact integer
+    # IDs and only resolve names when a key is read.
+    __slots__ = ()
+    KEYS = ()
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        raise TypeError(f"{type(self).__name__} keys cannot be deleted")
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    @classmethod
+    def from_dict(cls, d):
+        record = cls()
+        for key in cls.KEYS:
+            if key in d:
+                record[key] = d[key]
+        return record
+
+
+def party_field(slot):
+    # A PartyMember attribute kept in slot. Setting it to a different value
+    # marks the owning base's party as changed.
+    get = attrgetter(slot)
+
+    def set(mon, value):
+        if value != get(mon):
+            if mon._owner is not None:
+                mon._owner._changed("party")
+            object.__setattr__(mon, slot, value)
+
+    return property(get, set)
+
+
+class PartyMember(Record):
+    __slots__ = ("_personality_value", "_move_ids", "_species_id", "_held_item_id", "_level", "_evs", "_owner")
+    KEYS = ("personality", "moves", "species", "held_item", "level", "evs")
+
+    def __init__(self, personality=0, move_ids=(0,) * MAX_MON_MOVES, species_id=0, held_item_id=0, level=0, evs=0):
+        self._personality_value = personality
+        self._move_ids = tuple(move_ids)
+        self._species_id = species_id
+        self._held_item_id = held_item_id
+        self._level = level
+        self._evs = evs
+        # The SecretBase whose party this is, if any.
+        self._owner = None
+
+    personality_value = party_field("_personality_value")
+    move_ids = party_field("_move_ids")
+    species_id = party_field("_species_id")
+    held_item_id = party_field("_held_item_id")
+    level = party_field("_level")
+    evs = party_field("_evs")
+
+    def __getstate__(self):
+        # Copies don't belong to any base until one adopts them.
+        return tuple(getattr(self, name) for name in self.__slots__[:-1])
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __repr__(self):
+        return f"PartyMember({self.to_dict()!r})"
+
+    def to_dict(self):
+        return {key: self[key] for key in self.KEYS}
 
+    @property
+    def personality(self):
+        return f"{self.personality_value:X}".zfill(8)
 
-def read_secret_base(f):
-    secret_base_id = BASE_NAMES[struct.unpack("<B", f.read(1))[0]]
-    info = struct.unpack("<B", f.read(1))[0]
-
-    to_register = info & 0b1111
-    gender = (info >> 4) & 0b1
-    battled_owner_today = (info >> 5) & 0b1
-    registry_status = (info >> 6) & 0b11
-
-    trainer_name_bytes = f.read(PLAYER_NAME_LENGTH)
-    trainer_id = f.read(TRAINER_ID_LENGTH)
-    ID = str(struct.unpack("<I", trainer_id)[0] & 0xFFFF).zfill(5)
-    SID = str(struct.unpack("<I", trainer_id)[0] >> 16).zfill(5)
-
-    language = Language(struct.unpack("<B", f.read(1))[0])
-    trainer_name = decode_text(trainer_name_bytes, language).strip()
-    num_secret_bases_received = struct.unpack("<H", f.read(2))[0]
-    num_times_entered = struct.unpack("<B", f.read(1))[0]
-    unused = struct.unpack("<B", f.read(1))[0]
-    decorations = struct.unpack("<16B", f.read(16))
-    decorations = [DECORATIONS[d] for d in decorations]
-    decoration_positions = struct.unpack("<16B", f.read(16))
-    decoration_positions = [
-        (
-            (d >> 4) + MAP_OFFSET,
-            (d & 0xF) + MAP_OFFSET
-        )
-        for d in decoration_positions
-    ]
-    f.read(2) # padding
-
-    party = read_party(f)
-
-    return {
-        "secret_base_id": secret_base_id,
-        "to_register": to_register,
-        "gender": gender,
-        "battled_owner_today": battled_owner_today,
-        "registry_status": registry_status,
-        "trainer_name": trainer_name,
-        "id": ID,
-        "sid": SID,
-        "language": language,
-        "num_secret_bases_received": num_secret_bases_received,
-        "num_times_entered": num_times_entered,
-        "unused": unused,
-        "decorations": decorations,
-        "decoration_positions": decoration_positions,
-        "party": party
-    }
-
-
-def export_secret_base(secret_base: dict) -> bytes:
-    data = b""
-    data += struct.pack("<B", BASE_NAMES_REV[secret_base["secret_base_id"]])
-    info = (
-        secret_base["to_register"]
-        | (
-            secret_base["gender"] << 4
-            | (secret_base["battled_owner_today"] << 5)
-            | (secret_base["registry_status"] << 6)
-        )
+    @personality.setter
+    def personality(self, value):
+        self.personality_value = int(value, 16) if isinstance(value, str) else int(value)
+
+    @property
+    def moves(self):
+        try:
+            return [MOVES[move] for move in self.move_ids]
+        except IndexError:
+            return list(self.move_ids)
+
+    @moves.setter
+    def moves(self, moves):
+        self.move_ids = tuple(MOVE_IDS.get(move, MOVE_IDS['None']) for move in moves)
+
+    @property
+    def species(self):
+        return POKEMON[self.species_id]
+
+    @species.setter
+    def species(self, name):
+        self.species_id = lookup_id(POKEMON_IDS, name, "species")
+
+    @property
+    def held_item(self):
+        return ITEMS[self.held_item_id]
+
+    @held_item.setter
+    def held_item(self, name):
+        self.held_item_id = lookup_id(ITEM_IDS, name, "item")
+
+
+class DecorationNames(Sequence):
+    # Live view of a base's decorations as names.
+    __slots__ = ("_base",)
+
+    def __init__(self, base):
+        self._base = base
+
+    def __len__(self):
+        return len(self._base.decoration_ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [DECORATIONS[d] for d in self._base.decoration_ids[i]]
+        return DECORATIONS[self._base.decoration_ids[i]]
+
+    def __setitem__(self, i, name):
+        decoration_id = lookup_id(DECORATION_IDS, name, "decoration")
+        base = self._base
+        if base.decoration_ids[i] != decoration_id:
+            base.decoration_ids[i] = decoration_id
+            base._changed("decorations")
+
+    def __eq__(self, other):
+        return isinstance(other, Sequence) and list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class DecorationPositions(Sequence):
+    # Live view of a base's decoration positions as (x, y) tuples.
+    __slots__ = ("_base",)
+
+    def __init__(self, base):
+        self._base = base
+
+    def __len__(self):
+        return len(self._base.positions) // 2
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("decoration position index out of range")
+        positions = self._base.positions
+        return positions[i * 2], positions[i * 2 + 1]
+
+    def __setitem__(self, i, position):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("decoration position index out of range")
+        x, y = position
+        base = self._base
+        if (base.positions[i * 2], base.positions[i * 2 + 1]) != (x, y):
+            base.positions[i * 2:i * 2 + 2] = array('h', (x, y))
+            base._changed("decoration_positions")
+
+    def __eq__(self, other):
+        return isinstance(other, Sequence) and list(self) == [tuple(p) for p in other]
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class SecretBase(Record):
+    __slots__ = (
+        "base_id", "to_register", "gender", "battled_owner_today", "registry_status",
+        "_trainer_name", "_trainer_name_raw", "trainer_id", "_language",
+        "num_secret_bases_received", "num_times_entered", "unused",
+        "decoration_ids", "positions", "_party",
+        # The undecoded record and which parts of it are still undecoded.
+        "_record", "_pending",
+        # layout_hash and team_hash, or None until they are next needed.
+        "_layout_hash", "_team_hash",
+        # Bit mask of the KEYS changed since the base was loaded or last
+        # marked clean.
+        "_dirty",
+    )
+    KEYS = (
+        "secret_base_id", "to_register", "gender", "battled_owner_today", "registry_status",
+        "trainer_name", "id", "sid", "language",
+        "num_secret_bases_received", "num_times_entered", "unused",
+        "decorations", "decoration_positions", "party",
     )
-    data += struct.pack("<B", info)
-    # print(secret_base['trainer_name'])
-    data += encode_text(secret_base["trainer_name"], secret_base["language"]).ljust(PLAYER_NAME_LENGTH, b"\xFF")
-    trainer_id = (int(secret_base["sid"]) << 16) | int(secret_base["id"])
-    data += struct.pack("<I", trainer_id)
-
-    data += struct.pack("<B", secret_base["language"])
-    data += struct.pack("<H", secret_base["num_secret_bases_received"])
-    data += struct.pack("<B", secret_base["num_times_entered"])
-    data += struct.pack("<B", secret_base["unused"])
-    decoration_ids = [DECORATIONS.index(d) for d in secret_base["decorations"]]
-    # print(decoration_ids, secret_base["decorations"])
-    data += struct.pack("<16B", *decoration_ids)
-    decoration_positions = [
-        (x - MAP_OFFSET) << 4 | (y - MAP_OFFSET)
-        for x, y in secret_base["decoration_positions"]
-    ]
-    data += struct.pack("<16B", *decoration_positions)
-    data += b"\x00\x00" # padding
 
-    data += export_party(secret_base["party"])
+    def __init__(self):
+        # An empty base slot.
+        self._pending = 0
+        self._record = None
+        self._layout_hash = None
+        self._team_hash = None
+        self._dirty = 0
+        self.base_id = 0
+        self.to_register = 0
+        self.gender = 0
+        self.battled_owner_today = 0
+        self.registry_status = 0
+        # The name is kept as the raw bytes from the save until it is read,
+        # and as a string once it has been set.
+        self._trainer_name = ""
+        self._trainer_name_raw = None
+        self.trainer_id = 0
+        self._language = Language.NONE
+        self.num_secret_bases_received = 0
+        self.num_times_entered = 0
+        self.unused = 0
+        self.decoration_ids = bytearray(DECOR_MAX_SECRET_BASE)
+        # x and y of each decoration, interleaved
+        self.positions = array('h', [MAP_OFFSET] * (DECOR_MAX_SECRET_BASE * 2))
+        self._party = adopt_party(self, [PartyMember() for _ in range(PARTY_SIZE)])
+
+    @classmethod
+    def from_dict(cls, d):
+        # A base built from a dict has nothing in the save to match, so all
+        # of it counts as changed.
+        base = super().from_dict(d)
+        object.__setattr__(base, "_dirty", ALL_DIRTY)
+        return base
+
+    @classmethod
+    def from_values(cls, values):
+        # Builds a base from the flat tuple SECRET_BASE_STRUCT unpacks to.
+        base = cls.__new__(cls)
+        object.__setattr__(base, "_pending", 0)
+        object.__setattr__(base, "_record", None)
+        object.__setattr__(base, "_layout_hash", None)
+        object.__setattr__(base, "_team_hash", None)
+        object.__setattr__(base, "_dirty", 0)
+        base._set_header(values[:8])
+        base._set_body(values[8:])
+        return base
+
+    @classmethod
+    def from_record(cls, buf, offset=0):
+        # A base that decodes itself from a copy of the 160 byte record the
+        # first time a field is used. The header (name, ids, counters) and the
+        # body (decorations and party) are decoded separately.
+        base = cls.__new__(cls)
+        object.__setattr__(base, "_pending", LAZY_HEADER | LAZY_BODY)
+        object.__setattr__(base, "_record", bytes(buf[offset:offset + SECRET_BASE_SIZE]))
+        object.__setattr__(base, "_layout_hash", None)
+        object.__setattr__(base, "_team_hash", None)
+        object.__setattr__(base, "_dirty", 0)
+        return base
+
+    # The decoders below assign with object.__setattr__ to skip the lazy
+    # check in __setattr__; they run once per record.
+
+    def _set_header(self, values):
+        base_id, info, trainer_name_raw, trainer_id, language, received, entered, unused = values
+        set_slot = object.__setattr__
+        set_slot(self, "base_id", base_id)
+        set_slot(self, "to_register", info & 0b1111)
+        set_slot(self, "gender", (info >> 4) & 0b1)
+        set_slot(self, "battled_owner_today", (info >> 5) & 0b1)
+        set_slot(self, "registry_status", (info >> 6) & 0b11)
+        set_slot(self, "_trainer_name", None)
+        set_slot(self, "_trainer_name_raw", trainer_name_raw)
+        set_slot(self, "trainer_id", trainer_id)
+        set_slot(self, "_language", Language(language))
+        set_slot(self, "num_secret_bases_received", received)
+        set_slot(self, "num_times_entered", entered)
+        set_slot(self, "unused", unused)
+
+    def _set_body(self, values):
+        # Each position byte is x in the high nibble and y in the low one.
+        packed = bytes(values[DECOR_MAX_SECRET_BASE:DECOR_MAX_SECRET_BASE * 2])
+        xy = bytearray(DECOR_MAX_SECRET_BASE * 2)
+        xy[0::2] = packed.translate(POSITION_X)
+        xy[1::2] = packed.translate(POSITION_Y)
+        positions = array('h', list(xy))
+        set_slot = object.__setattr__
+        set_slot(self, "decoration_ids", bytearray(values[:DECOR_MAX_SECRET_BASE]))
+        set_slot(self, "positions", positions)
+        set_slot(self, "_party", adopt_party(self, decode_party(values[DECOR_MAX_SECRET_BASE * 2:])))
+
+    def _decode(self, part):
+        record = self._record
+        object.__setattr__(self, "_pending", self._pending & ~part)
+        if part == LAZY_HEADER:
+            self._set_header(SECRET_BASE_HEADER_STRUCT.unpack_from(record))
+        else:
+            self._set_body(SECRET_BASE_BODY_STRUCT.unpack_from(record, SECRET_BASE_HEADER_STRUCT.size))
+        if not self._pending:
+            object.__setattr__(self, "_record", None)
+
+    def __getattr__(self, name):
+        # Only reached when a slot has not been set yet, i.e. its part of a
+        # lazy record has not been decoded.
+        part = LAZY_PARTS.get(name)
+        if part is None or not self._pending & part:
+            raise AttributeError(name)
+        self._decode(part)
+        return object.__getattribute__(self, name)
+
+    def __setattr__(self, name, value):
+        # Decode before writing so the write isn't overwritten later.
+        part = LAZY_PARTS.get(name)
+        if part is not None and self._pending & part:
+            self._decode(part)
+        key = DIRTY_KEYS.get(name)
+        if key is not None:
+            old = getattr(self, name, value)
+            if old != value:
+                if name != "trainer_id":
+                    self._changed(key)
+                else:
+                    if (old ^ value) & 0xFFFF:
+                        self._changed("id")
+                    if (old ^ value) >> 16:
+                        self._changed("sid")
+        object.__setattr__(self, name, value)
+
+    def _changed(self, key):
+        object.__setattr__(self, "_dirty", self._dirty | DIRTY_BITS[key])
+        cache = HASH_CACHES.get(key)
+        if cache is not None:
+            object.__setattr__(self, cache, None)
+
+    @property
+    def dirty(self):
+        # Whether anything has changed since the base was loaded or last
+        # marked clean.
+        return bool(self._dirty)
+
+    @property
+    def dirty_fields(self):
+        return tuple(key for key in self.KEYS if self._dirty & DIRTY_BITS[key])
+
+    def mark_clean(self):
+        # Call once the base has been written out.
+        object.__setattr__(self, "_dirty", 0)
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name not in ("_record", "_pending")}
+
+    def __setstate__(self, state):
+        object.__setattr__(self, "_pending", 0)
+        object.__setattr__(self, "_record", None)
+        object.__setattr__(self, "_layout_hash", None)
+        object.__setattr__(self, "_team_hash", None)
+        object.__setattr__(self, "_dirty", 0)
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+        adopt_party(self, self._party)
+
+    def record_values(self) -> list:
+        # The flat list SECRET_BASE_STRUCT packs.
+        trainer_name = self._trainer_name_raw
+        if trainer_name is None:
+            trainer_name = encode_text(self._trainer_name, self._language).ljust(PLAYER_NAME_LENGTH, b"\xFF")
+        info = (
+            self.to_register
+            | (
+                self.gender << 4
+                | (self.battled_owner_today << 5)
+                | (self.registry_status << 6)
+            )
+        )
+        positions = self.positions
+        return [
+            self.base_id,
+            info,
+            trainer_name,
+            self.trainer_id,
+            self._language,
+            self.num_secret_bases_received,
+            self.num_times_entered,
+            self.unused,
+            *self.decoration_ids,
+            *[
+                (positions[i] - MAP_OFFSET) << 4 | (positions[i + 1] - MAP_OFFSET)
+                for i in range(0, len(positions), 2)
+            ],
+            *party_values(self._party),
+        ]
+
+    def to_dict(self):
+        d = {key: self[key] for key in self.KEYS}
+        d["decorations"] = list(d["decorations"])
+        d["decoration_positions"] = list(d["decoration_positions"])
+        d["party"] = [mon.to_dict() for mon in d["party"]]
+        return d
+
+    def __repr__(self):
+        return f"SecretBase({self.trainer_name!r}, id={self.id})"
+
+    @property
+    def secret_base_id(self):
+        return BASE_NAMES[self.base_id]
+
+    @secret_base_id.setter
+    def secret_base_id(self, name):
+        self.base_id = BASE_NAMES_REV[name]
+
+    @property
+    def trainer_name(self):
+        if self._trainer_name is None:
+            self._trainer_name = decode_text(self._trainer_name_raw, self._language).strip()
+        return self._trainer_name
+
+    @trainer_name.setter
+    def trainer_name(self, name):
+        # Keep the original bytes when the name is set to what it already was.
+        if name != self.trainer_name:
+            self._trainer_name = name
+            self._trainer_name_raw = None
+            self._changed("trainer_name")
+
+    @property
+    def id(self):
+        return str(self.trainer_id & 0xFFFF).zfill(5)
+
+    @id.setter
+    def id(self, value):
+        self.trainer_id = (self.trainer_id & 0xFFFF0000) | (int(value) & 0xFFFF)
+
+    @property
+    def sid(self):
+        return str(self.trainer_id >> 16).zfill(5)
+
+    @sid.setter
+    def sid(self, value):
+        self.trainer_id = ((int(value) & 0xFFFF) << 16) | (self.trainer_id & 0xFFFF)
+
+    @property
+    def language(self):
+        return self._language
+
+    @language.setter
+    def language(self, value):
+        value = Language(value)
+        if value != self._language:
+            # The name was decoded with the old language; re-encode it with
+            # the new one on export.
+            self._trainer_name = self.trainer_name
+            self._trainer_name_raw = None
+            self._language = value
+
+    @property
+    def decorations(self):
+        return DecorationNames(self)
+
+    @decorations.setter
+    def decorations(self, names):
+        self.decoration_ids = bytearray(lookup_id(DECORATION_IDS, name, "decoration") for name in names)
+
+    @property
+    def decoration_positions(self):
+        return DecorationPositions(self)
+
+    @decoration_positions.setter
+    def decoration_positions(self, positions):
+        self.positions = array('h', [coord for x, y in positions for coord in (x, y)])
+
+    @property
+    def party(self):
+        return self._party
+
+    @party.setter
+    def party(self, party):
+        if party is self._party:
+            return
+        self._party = adopt_party(self, [mon if isinstance(mon, PartyMember) else PartyMember.from_dict(mon) for mon in party])
+
+
+def adopt_party(base, party):
+    # Points each member back at base so that editing it marks the base's
+    # party as changed.
+    for mon in party:
+        mon._owner = base
+    return party
 
-    return data
+
+LAZY_PARTS = {
+    **dict.fromkeys(
+        (
+            "base_id", "to_register", "gender", "battled_owner_today", "registry_status",
+            "_trainer_name", "_trainer_name_raw", "trainer_id", "_language",
+            "num_secret_bases_received", "num_times_entered", "unused",
+        ),
+        LAZY_HEADER,
+    ),
+    **dict.fromkeys(("decoration_ids", "positions", "_party"), LAZY_BODY),
+}
+
+# The key each stored slot belongs to, for dirty tracking. trainer_id is
+# split into id and sid when it changes. The trainer name slots also cache
+# the decoded name, so the trainer_name setter reports its own changes.
+# decoration_ids, positions and party members are mostly changed in place,
+# through DecorationNames, DecorationPositions and PartyMember, which report
+# the change themselves.
+DIRTY_KEYS = {
+    "base_id": "secret_base_id",
+    "to_register": "to_register",
+    "gender": "gender",
+    "battled_owner_today": "battled_owner_today",
+    "registry_status": "registry_status",
+    "trainer_id": "id",
+    "_language": "language",
+    "num_secret_bases_received": "num_secret_bases_received",
+    "num_times_entered": "num_times_entered",
+    "unused": "unused",
+    "decoration_ids": "decorations",
+    "positions": "decoration_positions",
+    "_party": "party",
+}
+DIRTY_BITS = {key: 1 << i for i, key in enumerate(SecretBase.KEYS)}
+ALL_DIRTY = (1 << len(SecretBase.KEYS)) - 1
+
+# The cached hash each key feeds into.
+HASH_CACHES = {
+    "decorations": "_layout_hash",
+    "decoration_positions": "_layout_hash",
+    "party": "_team_hash",
+}
+
+
+def decode_secret_base(buf, offset=0) -> SecretBase:
+    # Decodes a record straight out of buf (bytes, bytearray or memoryview).
+    return SecretBase.from_values(SECRET_BASE_STRUCT.unpack_from(buf, offset))
+
+
+def decode_secret_bases(buf) -> list:
+    # Decodes back to back records, e.g. a whole save's worth, in one pass.
+    return [SecretBase.from_values(values) for values in SECRET_BASE_STRUCT.iter_unpack(buf)]
+
+
+def read_secret_base(f):
+    return decode_secret_base(f.read(SECRET_BASE_SIZE))
+
+
+def secret_base_values(secret_base) -> list:
+    # The inverse of decode_secret_base: the flat list SECRET_BASE_STRUCT
+    # packs. Plain dicts in the exported JSON format are accepted too.
+    if not isinstance(secret_base, SecretBase):
+        secret_base = SecretBase.from_dict(secret_base)
+    return secret_base.record_values()
+
+
+def encode_secret_base(secret_base, buf, offset=0):
+    # Encodes a record straight into buf, which must be writable.
+    SECRET_BASE_STRUCT.pack_into(buf, offset, *secret_base_values(secret_base))
+
+
+def export_secret_base(secret_base) -> bytes:
+    return SECRET_BASE_STRUCT.pack(*secret_base_values(secret_base))
 
 
 def which_save(a, b):
@@ -396,56 +1059,208 @@ def which_save(a, b):
         return 'B'
 
 
-def load_full_save(path) -> FullSave:
+def read_save_file(path) -> bytes:
+    # One read for the whole file; everything else is a view into it.
     with open(path, "rb") as f:
-        save_a = read_save(f)
-        save_b = read_save(f)
-        extra = read_extra_sections(f)
+        return f.read(FULL_SAVE_SIZE)
+
+
+def write_full_save(fullsave, path):
+    # Streams fullsave into a temporary file next to path, flushes it to
+    # disk and then renames it over path, so path always holds either the
+    # old save or the complete new one, even if the program or machine dies
+    # halfway through.
+    path = os.path.abspath(path)
+    folder, name = os.path.split(path)
+    fd, tmp = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.writelines(fullsave.chunks())
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp files are private; keep the old file's permissions, or use
+        # the usual ones for a new file.
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    sync_folder(folder)
 
-    save = FullSave(save_a, save_b, extra)
-    return save
+
+def sections_equal(a, b):
+    if a is b:
+        return True
+    if (a.section_id, a.checksum, a.signature, a.save_index) != (b.section_id, b.checksum, b.signature, b.save_index):
+        return False
+    return a.data is b.data or bytes(a.data) == bytes(b.data)
+
+
+def dirty_ranges(original, fullsave):
+    # (offset, data) for each run of sections of fullsave that differ from
+    # original, with neighbouring sections merged into one write.
+    ranges = []
+    halves = ((SAVE_A_OFFSET, original.save_a, fullsave.save_a), (SAVE_B_OFFSET, original.save_b, fullsave.save_b))
+    for start, old_half, new_half in halves:
+        if old_half is new_half:
+            continue
+        for i, (old, new) in enumerate(zip(old_half.sections, new_half.sections)):
+            if sections_equal(old, new):
+                continue
+            offset = start + i * SECTION_STRIDE
+            if ranges and ranges[-1][0] + len(ranges[-1][1]) == offset:
+                ranges[-1][1].extend(b"".join(new.chunks()))
+            else:
+                ranges.append((offset, bytearray(b"".join(new.chunks()))))
+
+    if original.extra_sections is not fullsave.extra_sections and bytes(original.extra_sections) != bytes(fullsave.extra_sections):
+        ranges.append((SAVE_SIZE * 2, bytearray(fullsave.extra_sections)))
+    return ranges
+
+
+def read_at(f, offset, length) -> bytes:
+    if hasattr(os, "pread"):
+        return os.pread(f.fileno(), length, offset)
+    f.seek(offset)
+    return f.read(length)
+
+
+def write_at(f, data, offset):
+    # Writes all of data, however many calls that takes.
+    view = memoryview(data)
+    while view:
+        if hasattr(os, "pwrite"):
+            n = os.pwrite(f.fileno(), view, offset)
+        else:
+            f.seek(offset)
+            n = f.write(view)
+        if not n:
+            raise OSError(f"wrote nothing at {offset:#x}")
+        view = view[n:]
+        offset += n
+
+
+def check_holds(f, original, ranges, path):
+    # Raises ValueError unless the file still holds original wherever ranges
+    # are about to be written: the footer of every section in them, and the
+    # extra sections in full.
+    footers = {}
+    for start, half in ((SAVE_A_OFFSET, original.save_a), (SAVE_B_OFFSET, original.save_b)):
+        for i, section in enumerate(half.sections):
+            footers[start + i * SECTION_STRIDE + SECTION_SIZE + SECTION_SKIP] = section.chunks()[2]
+
+    for offset, data in ranges:
+        if offset >= SAVE_SIZE * 2:
+            expected = {offset: bytes(original.extra_sections)}
+        else:
+            expected = {
+                footer: footers[footer]
+                for footer in range(offset + SECTION_SIZE + SECTION_SKIP, offset + len(data), SECTION_STRIDE)
+            }
+        for at, want in expected.items():
+            if read_at(f, at, len(want)) != want:
+                raise ValueError(f"{path} no longer holds the save it was loaded from (bytes at {at:#x} differ)")
+
+
+def patch_full_save(path, original, fullsave) -> int:
+    # Writes only the sections of fullsave that differ from original into
+    # path, which must still hold original (e.g. the file it was loaded
+    # from); ValueError is raised before anything is written if it doesn't.
+    # Returns the number of bytes written. Much less I/O than
+    # write_full_save when a few bases changed, but the file is patched in
+    # place, so a crash halfway through can leave it partly updated.
+    ranges = dirty_ranges(original, fullsave)
+    written = 0
+    with open(path, "r+b", buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < FULL_SAVE_SIZE:
+            raise ValueError(f"{path} is {size} bytes, too short to be a save")
+        check_holds(f, original, ranges, path)
+        for offset, data in ranges:
+            write_at(f, data, offset)
+            written += len(data)
+        if ranges:
+            os.fsync(f.fileno())
+    return written
+
+
+def sync_folder(folder):
+    # Makes a rename in folder durable. Not possible on Windows, where
+    # directories can't be opened, and not needed there either.
+    try:
+        fd = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def parse_full_save(buf) -> FullSave:
+    save_a = read_save(buf, SAVE_A_OFFSET)
+    save_b = read_save(buf, SAVE_B_OFFSET)
+    extra = read_extra_sections(buf)
+
+    return FullSave(save_a, save_b, extra)
+
+
+def load_full_save(path) -> FullSave:
+    return parse_full_save(read_save_file(path))
 
 
 def load_save(path) -> HalfSave:
-    with open(path, "rb") as f:
-        save_a = read_save(f)
-        save_b = read_save(f)
+    save = load_full_save(path)
 
-    print('Using save ' + which_save(save_a, save_b))
+    print('Using save ' + save.active)
 
-    if which_save(save_a, save_b) == 'A':
-        save = save_a
-    else:
-        save = save_b
+    return save.get_active()
 
-    return save
 
+class ChecksumWarning(UserWarning):
+    pass
 
-def get_base_from_save(save):
-    for section in save.sections:
-        data = BytesIO(section.data)
-        checksum = checksum_block(data, section.section_id)
 
-        if checksum != section.checksum:
-            print("Checksum failed for section", section.section_id)
-            print("Expected", section.checksum, "but got", checksum)
-            continue
+def check_section(section, problems=None) -> bool:
+    # Returns whether section's checksum is right. If it isn't, the problem
+    # is added to problems as a dict like validate.py's, or issued as a
+    # ChecksumWarning if no list is given.
+    checksum = checksum_section(section.data, section.section_id)
+    if checksum == section.checksum:
+        return True
+    message = f"section {section.section_id}: stored checksum {section.checksum:04X}, computed {checksum:04X}"
+    if problems is None:
+        warnings.warn(message, ChecksumWarning, stacklevel=3)
+    else:
+        problems.append({"check": "checksum", "section_id": section.section_id, "message": message})
+    return False
+
 
-        if section.section_id == 3:
-            data = BytesIO(section.data[0x77C:])
-            secret_base = read_secret_base(data)
+def get_base_from_save(save, problems=None):
+    section = save.section_by_id(3)
+    if not check_section(section, problems):
+        return None
 
-            return secret_base
+    return decode_secret_base(section.data, 0x77C)
 
 
 def getVersion(save):
     version = None
 
-    # The save index value is the same across all sections.
-    save_index = save.sections[0].save_index
-
-    # Find where section section 0 is using the save index and extract the game code.
-    gameCode = int(save.sections[save_index % 14].data[172:176][0])
+    # Extract the game code from section 0.
+    section_0 = save.section_by_id(0)
+    gameCode = int(section_0.data[172:176][0])
 
     match gameCode:
         case 0:
@@ -454,7 +1269,7 @@ def getVersion(save):
             version = 'firered/leafgreen'
         case _:
             # R/S only goes up to 0x890, so check for anything after that
-            if any(byte != 0 for byte in save.sections[save_index % 14].data[0x890:0xF2C]):
+            if any(byte != 0 for byte in section_0.data[0x890:0xF2C]):
                 version = 'emerald'
             else:
                 version = 'ruby/sapphire'
@@ -462,136 +1277,182 @@ def getVersion(save):
     return version
 
 
-def get_all_bases_from_save(save, version):
-    bases = []
-    split_base = b''
-    save_index = save.sections[0].save_index
+SECRET_BASE_COUNT = 20
+# Slots 0-7 start in section 2, 8-19 are in section 3, and slot 7 runs over
+# from the end of section 2 into the start of section 3.
+SPLIT_SLOT = 7
+
+
+@dataclass(frozen=True)
+class SaveLayout:
+    # Where the Secret Base records are for one game version. spans[i] is a
+    # tuple of (section_id, offset, length) pieces that make up slot i, in
+    # order; every slot has one piece except the split one, which has two.
+    # region is the same kind of tuple for all 20 records back to back.
+    version: str
+    section_2_start: int
+    spans: tuple = field(init=False, repr=False)
+    region: tuple = field(init=False, repr=False)
+
+    def __post_init__(self):
+        spans = []
+        for i in range(SPLIT_SLOT):
+            spans.append(((2, self.section_2_start + SECRET_BASE_SIZE * i, SECRET_BASE_SIZE),))
+
+        split_start = self.section_2_start + SECRET_BASE_SIZE * SPLIT_SLOT
+        head = SECTION_SIZE - split_start
+        tail = SECRET_BASE_SIZE - head
+        spans.append(((2, split_start, head), (3, 0, tail)))
+
+        for i in range(SECRET_BASE_COUNT - SPLIT_SLOT - 1):
+            spans.append(((3, tail + SECRET_BASE_SIZE * i, SECRET_BASE_SIZE),))
+        object.__setattr__(self, "spans", tuple(spans))
+
+        region = (
+            (2, self.section_2_start, SECTION_SIZE - self.section_2_start),
+            (3, 0, tail + SECRET_BASE_SIZE * (SECRET_BASE_COUNT - SPLIT_SLOT - 1)),
+        )
+        object.__setattr__(self, "region", region)
 
-    # Secret Base data is split between sections 2 and 3.
-    sections = []
-    sections.append(save.sections[(save_index + 2) % 14])
-    sections.append(save.sections[(save_index + 3) % 14])
-
-    # Account for save file differences between emerald and ruby/sapphire.
-    if version == 'emerald':
-        section_2_start = 0xB1C
-        base_8_start = 0xF7C
-        section_2_end = 4
-        section_3_start = 156
-        section_3_cont = 0x9C
+    def offset(self, index):
+        # Where slot index starts in its (first) section.
+        return self.spans[index][0][1]
+
+
+LAYOUTS = {
+    'emerald': SaveLayout('emerald', 0xB1C),
+    'ruby/sapphire': SaveLayout('ruby/sapphire', 0xA88),
+}
+
+
+def get_layout(version) -> SaveLayout:
+    try:
+        return LAYOUTS[version]
+    except KeyError:
+        raise ValueError(f"{version!r} saves have no secret bases") from None
+
+
+def read_record(sections, spans) -> bytes:
+    # Joins the pieces of one record. sections maps section id to Section.
+    return b"".join(bytes(sections[section_id].data[offset:offset + length]) for section_id, offset, length in spans)
+
+
+def write_record(sections, spans, data):
+    # Copies data over the pieces of one record without touching checksums.
+    # sections maps section id to a writable Section.
+    pos = 0
+    for section_id, offset, length in spans:
+        section = sections[section_id]
+        if not isinstance(section.data, bytearray):
+            section.data = bytearray(section.data)
+        section.data[offset:offset + length] = data[pos:pos + length]
+        pos += length
+
+
+def get_all_bases_from_save(save, version, lazy=False, problems=None):
+    # With lazy=True the bases only decode the fields that get used, which
+    # makes listing names and IDs cheap. Damaged sections are reported as in
+    # check_section.
+    if lazy:
+        decode = SecretBase.from_record
     else:
-        section_2_start = 0xA88
-        base_8_start = 0xEE8
-        section_2_end = 152
-        section_3_start = 8
-        section_3_cont = 0x8
-
-    for section in sections:
-        data = BytesIO(section.data)
-        try:
-            checksum = checksum_block(data, section.section_id)
-            if checksum != section.checksum:
-                print("Checksum failed for section", section.section_id)
-                print("Expected", section.checksum, "but got", checksum)
-                continue
-        except:
-            print("Checksum failed for section", section.section_id)
-            pass
+        decode = decode_secret_base
+
+    layout = get_layout(version)
+
+    # Secret Base data is split between sections 2 and 3. There is always one
+    # entry per slot; slots in a section that fails its checksum are None.
+    sections = {}
+    for section_id in (2, 3):
+        section = save.section_by_id(section_id)
+        if check_section(section, problems):
+            sections[section_id] = section
+
+    if len(sections) == 2:
+        # The records are back to back across the two sections, so join
+        # them once and cut them all out of one buffer.
+        region = read_record(sections, layout.region)
+        if lazy:
+            return [decode(region, offset) for offset in range(0, len(region), SECRET_BASE_SIZE)]
+        return decode_secret_bases(region)
 
-        match section.section_id:
-            case 2:
-                for i in range(7):
-                    data = BytesIO(section.data[section_2_start + (160*i):])
-                    secret_base = read_secret_base(data)
-                    bases.append(secret_base)
-
-                # The eight secret base data is split between the sections.
-                split_base += section.data[base_8_start:base_8_start+section_2_end]
-            case 3:
-                split_base += section.data[0:section_3_start]
-                data = BytesIO(split_base)
-                secret_base = read_secret_base(data)
-                bases.append(secret_base)
-
-                for i in range(12):
-                    data = BytesIO(section.data[section_3_cont + (160*i):])
-                    secret_base = read_secret_base(data)
-                    bases.append(secret_base)
-            case _:
-                print("Wrong save file section.")
+    bases = []
+    for spans in layout.spans:
+        if any(section_id not in sections for section_id, _, _ in spans):
+            bases.append(None)
+        elif len(spans) == 1:
+            section_id, offset, _ = spans[0]
+            bases.append(decode(sections[section_id].data, offset))
+        else:
+            bases.append(decode(read_record(sections, spans)))
 
     return bases
 
 
-def insert_base_to_section(section, secret_base, index, version):
-    # Account for save file differences between emerald and ruby/sapphire.
-    if version == 'emerald':
-        section_2_start = 0xB1C
-        section_3_cont = 0x9C
-    else:
-        section_2_start = 0xA88
-        section_3_cont = 0x8
+def record_offset(index, version):
+    return get_layout(version).offset(index)
 
-    if index < 8:
-        section.data = section.data[:section_2_start + (160*index)] + export_secret_base(secret_base) + section.data[section_2_start + (160*index) + len(export_secret_base(secret_base)):]
-    else:
-        section.data = section.data[:section_3_cont + (160*(index-8))] + export_secret_base(secret_base) + section.data[section_3_cont + (160*(index-8)) + len(export_secret_base(secret_base)):]
+
+def insert_base_to_section(section, secret_base, index, version):
+    # Not for the split slot; see insert_split_base_to_section.
+    spans = get_layout(version).spans[index]
+    write_record({spans[0][0]: section}, spans, export_secret_base(secret_base))
     section.fix_checksum()
     return section
 
 
 def insert_split_base_to_section(s2, s3, secret_base, version):
-    # Account for save file differences between emerald and ruby/sapphire.
-    if version == 'emerald':
-        base_8_start = 0xF7C
-        section_2_end = 4
-        section_3_start = 156
-    else:
-        base_8_start = 0xEE8
-        section_2_end = 152
-        section_3_start = 8
-
-    # index isn't necessary since it's always 8
-    data = export_secret_base(secret_base)
-    s2.data = s2.data[:base_8_start] + data[:section_2_end] + s2.data[base_8_start+section_2_end:]
-    s3.data = data[section_2_end:] + s3.data[section_3_start:]
+    write_record({2: s2, 3: s3}, get_layout(version).spans[SPLIT_SLOT], export_secret_base(secret_base))
     s2.fix_checksum()
     s3.fix_checksum()
     return s2, s3
 
 
-def insert_base_to_save(base_save, secret_base, index, version):
-    save = deepcopy(base_save)
-    i = 0
-    s2idx, s3idx = None, None
+def write_bases_to_save(save, bases, version):
+    # Writes many bases into save in place. bases is a dict or an iterable of
+    # (index, secret_base) pairs. Each base is exported once, and each
+    # section that was written to is checksummed once at the end.
+    if isinstance(bases, dict):
+        bases = bases.items()
 
-    for i in range(len(save.sections)):
-        section = save.sections[i]
+    layout = get_layout(version)
 
-        if index < 7 and section.section_id == 2:
-            section = insert_base_to_section(section, secret_base, index, version)
-        if index >= 8 and section.section_id == 3:
-            section = insert_base_to_section(section, secret_base, index, version)
+    written = {}
+    for index, secret_base in bases:
+        spans = layout.spans[index]
+        for section_id, _, _ in spans:
+            if section_id not in written:
+                written[section_id] = save.writable_section(save.section_index(section_id))
+        if len(spans) == 1:
+            section_id, offset, _ = spans[0]
+            encode_secret_base(secret_base, written[section_id].data, offset)
+        else:
+            write_record(written, spans, export_secret_base(secret_base))
 
-        if index == 7:
-            if section.section_id == 2:
-                s2idx = i
-            if section.section_id == 3:
-                s3idx = i
+    for section in written.values():
+        section.fix_checksum()
 
-        save.sections[i] = section
+    return save
 
-    if index == 7:
-        # really annoying
-        s2, s3 = insert_split_base_to_section(save.sections[s2idx], save.sections[s3idx], secret_base, version)
-        save.sections[s2idx] = s2
-        save.sections[s3idx] = s3
 
-    return save
+def write_base_to_save(save, secret_base, index, version):
+    # Writes secret_base into save in place. Sections are copied the first
+    # time save writes to them, so anything save was copied from is untouched.
+    return write_bases_to_save(save, [(index, secret_base)], version)
+
+
+def insert_bases_to_save(base_save, bases, version):
+    save = base_save.copy()
+    return write_bases_to_save(save, bases, version)
+
+
+def insert_base_to_save(base_save, secret_base, index, version):
+    save = base_save.copy()
+    return write_base_to_save(save, secret_base, index, version)
 
 
 def insert_halfsave_to_save(base_save, half_save) -> FullSave:
-    save = deepcopy(base_save)
+    save = base_save.copy()
     if which_save(save.save_a, save.save_b) == 'A':
         save.save_a = half_save
     else: